@@ -0,0 +1,26 @@
+from core import embeddings, inference
+from core.config import INFERENCE_SERVER_ADDRESS
+
+
+def load_models():
+    if INFERENCE_SERVER_ADDRESS:
+        inference.connect_remote()
+    else:
+        inference.activate(inference.load_models())
+    if not inference.models_ready():
+        raise SystemExit("Models not loaded; cannot compute embeddings")
+
+
+def backfill_embeddings():
+    """Recompute the embedding of every catalog image and rebuild the index"""
+    load_models()
+    snake_ids, vectors = embeddings.embed_catalog(progress=lambda done: print(f"Embedded {done} images..."))
+    if not snake_ids:
+        print("No catalog images found.")
+        return
+    embeddings.index.rebuild(snake_ids, vectors, model_version=inference.current_version())
+    print(f"Done. Indexed {len(snake_ids)} images.")
+
+
+if __name__ == "__main__":
+    backfill_embeddings()
@@ -0,0 +1,229 @@
+"""
+Catalog-scaling benchmark for the snake and snake_related routers.
+
+Seeds a throwaway SQLite catalog of each size (main snakes plus related
+species, each with its own JPEG, and a fixed relation fan-out), then calls
+each DB-side endpoint in-process and reports, per endpoint and size:
+
+    latency       median and p95 over --repeat calls
+    queries       SQL statements one call runs
+    body / wire   response bytes before and after compression
+    peak MiB      Python allocation peak during one call (tracemalloc)
+
+An endpoint whose query count grows with the catalog is flagged: that is an
+N+1 pattern. Each size runs in its own process so peak memory and the
+database engine don't carry over between sizes.
+
+    python -m benchmarks.bench_catalog --sizes 10 1000 10000 100000
+    python -m benchmarks.bench_catalog --sizes 10 1000 --skip-identify --json results.json
+
+identify-with-related needs the stub models (and so TensorFlow); its
+model time is constant, so its growth across sizes is the catalog lookups.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = [
+    "all_snapshot",
+    "all_db",
+    "all_fields",
+    "related",
+    "all_relations",
+    "batch_add_relations",
+    "identify_with_related",
+]
+
+
+# ------------------------
+# One catalog size (runs in a child process)
+# ------------------------
+def run_size(size: int, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"snake-bench-{size}-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        MODEL_DIR=os.path.join(workdir, "models"),
+        EMBEDDING_DIR=os.path.join(workdir, "embeddings"),
+        SNAPSHOT_DIR=os.path.join(workdir, "snapshot"),
+        RELATION_GRAPH_STAMP=os.path.join(workdir, "relation_graph.version"),
+        PROFILE_DIR=os.path.join(workdir, "profiles"),
+        MODEL_RELOAD_TRIGGER=os.path.join(workdir, "model_reload"),
+        MODEL_WATCH_INTERVAL_S="0",
+    )
+    # The app reads its configuration at import time
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        return _measure_size(size, args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _measure_size(size: int, args, workdir: str) -> dict:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from benchmarks.seed import seed_database, make_jpeg, PASSWORD, ADMIN_EMAIL
+    from core import catalog_snapshot, inference, migrations
+    from models.database import SessionLocal, engine
+    import main
+
+    migrations.upgrade()
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        main_ids, related_ids = seed_database(db, size, 0, args.catalog_image_size, fanout=args.fanout)
+    finally:
+        db.close()
+    seed_seconds = time.perf_counter() - started
+
+    if not args.skip_identify:
+        from benchmarks.stub_models import write_stub_models
+        write_stub_models(os.environ["MODEL_DIR"])
+        inference.activate(inference.load_models())
+
+    queries = [0]
+    event.listen(engine, "before_cursor_execute", lambda *_: queries.__setitem__(0, queries[0] + 1))
+
+    # No lifespan: start-up (snapshot build, model loading) is done by hand
+    client = TestClient(main.app)
+    token = client.post("/auth/login", json={"email": ADMIN_EMAIL, "password": PASSWORD}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+    image = make_jpeg(4242, args.image_size)
+    parent = main_ids[0]
+    # Seeded relations always point from a lower id to a higher one, so
+    # (higher, lower) pairs are always new
+    ids = main_ids + related_ids
+    pairs = ((a, b) for i, a in enumerate(ids) for b in ids[:i])
+    batch_size = min(args.batch_size, len(ids) * (len(ids) - 1) // 2 // (args.repeat + 2))
+
+    def batch_add():
+        batch = [{"snakeid": a, "relatedsnakeid": b} for a, b in (next(pairs) for _ in range(batch_size))]
+        return client.post("/snake-related/batch-add-relations", json=batch, headers=admin)
+
+    calls = {
+        "all_snapshot": lambda: client.get("/snake/all"),
+        "all_db": lambda: client.get("/snake/all"),
+        "all_fields": lambda: client.get("/snake/all?fields=name,class_label&lang=en"),
+        "related": lambda: client.get(f"/snake-related/related/{parent}"),
+        "all_relations": lambda: client.get("/snake-related/all-relations", headers=admin),
+        "batch_add_relations": batch_add,
+        "identify_with_related": lambda: client.post(
+            "/snake-related/identify-with-related", files={"image": ("snake.jpg", image, "image/jpeg")}
+        ),
+    }
+
+    results = {"size": size, "seed_s": round(seed_seconds, 1), "endpoints": {}}
+    for name in args.endpoints:
+        if name == "identify_with_related" and args.skip_identify:
+            continue
+        if name == "all_snapshot":
+            catalog_snapshot.snapshot.rebuild()
+        elif name == "all_db":
+            catalog_snapshot.snapshot.invalidate()
+        results["endpoints"][name] = measure(calls[name], queries, args.repeat)
+    return results
+
+
+def measure(call, queries, repeat: int) -> dict:
+    call()  # warm caches and lazy imports
+    times, counts = [], []
+    for _ in range(repeat):
+        queries[0] = 0
+        start = time.perf_counter()
+        response = call()
+        times.append(time.perf_counter() - start)
+        counts.append(queries[0])
+        if response.status_code >= 400:
+            return {"error": f"HTTP {response.status_code}: {response.text[:200]}"}
+
+    tracemalloc.start()
+    response = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times.sort()
+    return {
+        "median_ms": statistics.median(times) * 1000,
+        "p95_ms": times[min(len(times) - 1, round(0.95 * (len(times) - 1)))] * 1000,
+        "queries": max(counts),
+        "body_bytes": len(response.content),
+        "wire_bytes": response.num_bytes_downloaded,
+        "peak_bytes": peak,
+    }
+
+
+# ------------------------
+# Driver
+# ------------------------
+def report(all_results):
+    print(f"\n{'endpoint':<22} {'species':>8} {'median ms':>10} {'p95 ms':>9} {'queries':>8} "
+          f"{'body KiB':>10} {'wire KiB':>10} {'peak MiB':>9}")
+    flagged = []
+    for name in ENDPOINTS:
+        rows = [(r["size"], r["endpoints"][name]) for r in all_results if name in r["endpoints"]]
+        for size, row in rows:
+            if "error" in row:
+                print(f"{name:<22} {size:>8} {row['error']}")
+                continue
+            print(f"{name:<22} {size:>8} {row['median_ms']:>10.1f} {row['p95_ms']:>9.1f} {row['queries']:>8} "
+                  f"{row['body_bytes'] / 1024:>10.1f} {row['wire_bytes'] / 1024:>10.1f} {row['peak_bytes'] / 2**20:>9.1f}")
+        counts = [row["queries"] for _, row in rows if "error" not in row]
+        if len(counts) > 1 and counts[-1] > counts[0]:
+            flagged.append(f"{name} ({counts[0]} -> {counts[-1]} queries)")
+    if flagged:
+        print(f"\n⚠️ Query count grows with catalog size (N+1?): {', '.join(flagged)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="Catalog sizes (species, >= 5)")
+    parser.add_argument("--image-size", type=int, default=224, help="Side of the uploaded JPEG in pixels")
+    parser.add_argument("--catalog-image-size", type=int, default=480,
+                        help="Side of the catalog JPEGs in pixels (one distinct image per snake)")
+    parser.add_argument("--fanout", type=int, default=10, help="Related species per snake")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per endpoint")
+    parser.add_argument("--batch-size", type=int, default=5, help="Relations per batch-add-relations call")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--skip-identify", action="store_true", help="Skip identify-with-related (no TensorFlow)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        # Last stdout line is the result; the app's own logging goes above it
+        print(json.dumps(run_size(args.child, args)))
+        return
+
+    all_results = []
+    for size in args.sizes:
+        print(f"Seeding and measuring {size} species...", flush=True)
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_catalog", "--child", str(size),
+             "--image-size", str(args.image_size), "--catalog-image-size", str(args.catalog_image_size),
+             "--fanout", str(args.fanout),
+             "--repeat", str(args.repeat), "--batch-size", str(args.batch_size),
+             "--endpoints", *args.endpoints] + (["--skip-identify"] if args.skip_identify else []),
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if child.returncode != 0:
+            print(child.stdout[-2000:], child.stderr[-4000:])
+            raise SystemExit(f"Benchmark for {size} species failed")
+        all_results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    report(all_results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Serialization benchmark for the catalog endpoints.
+
+Compares what /snake/all used to do (hand-built dicts -> jsonable_encoder ->
+stdlib json, as FastAPI's JSONResponse does) against the typed SnakeOut
+response model, both serialized straight to JSON bytes by Pydantic and as
+the app serves it (model -> JSON-compatible data -> FastJSONResponse), plus
+orjson on the raw dicts as a lower bound.
+
+    python -m benchmarks.bench_serialization --sizes 1000 5000 --image-bytes 20000
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from core.responses import FastJSONResponse
+from schemas.snake import SnakeOut
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENGLISH = "The Russell's viper is a nocturnal, highly venomous snake found across the dry zone. "
+SINHALA = "තිත් පොළඟා රාත්‍රී කාලයේ ක්‍රියාශීලී වන, ඉතා විෂ සහිත සර්පයෙකි. "
+
+
+def make_catalog(size: int, image_bytes: int, description_chars: int):
+    english = (ENGLISH * (description_chars // len(ENGLISH) + 1))[:description_chars]
+    sinhala = (SINHALA * (description_chars // len(SINHALA) + 1))[:description_chars]
+    image = os.urandom(image_bytes) if image_bytes else None
+    return [
+        SimpleNamespace(
+            snakeid=i,
+            snakeenglishname=f"Species {i}",
+            snakesinhalaname=f"සර්පයා {i}",
+            snakeenglishdescription=english,
+            snakesinhaladescription=sinhala,
+            snakeimage=image,
+            snakeimage_type="image/jpeg",
+            class_label=str(i % 5) if i < 5 else None,
+        )
+        for i in range(size)
+    ]
+
+
+def legacy_dicts(snakes):
+    result = []
+    for snake in snakes:
+        snake_data = {
+            "snakeid": snake.snakeid,
+            "snakeenglishname": snake.snakeenglishname,
+            "snakesinhalaname": snake.snakesinhalaname,
+            "snakeenglishdescription": snake.snakeenglishdescription,
+            "snakesinhaladescription": snake.snakesinhaladescription,
+            "class_label": str(snake.class_label) if snake.class_label is not None else None
+        }
+        if snake.snakeimage:
+            image_type = snake.snakeimage_type or 'image/jpeg'
+            image_base64 = base64.b64encode(snake.snakeimage).decode('utf-8')
+            snake_data["image_data"] = f"data:{image_type};base64,{image_base64}"
+        result.append(snake_data)
+    return result
+
+
+def stdlib_json(snakes) -> bytes:
+    content = jsonable_encoder(legacy_dicts(snakes))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_dicts(snakes) -> bytes:
+    return orjson.dumps(legacy_dicts(snakes))
+
+
+SNAKE_LIST = TypeAdapter(List[SnakeOut])
+
+
+def response_model_dump_json(snakes) -> bytes:
+    return SNAKE_LIST.dump_json([SnakeOut.from_snake(snake) for snake in snakes])
+
+
+def response_model_served(snakes) -> bytes:
+    content = SNAKE_LIST.dump_python([SnakeOut.from_snake(snake) for snake in snakes], mode="json")
+    return FastJSONResponse(content).body
+
+
+def measure(fn, snakes, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(snakes)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(snakes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--image-bytes", type=int, default=0, help="Size of each snake's image (0 = no images)")
+    parser.add_argument("--description-chars", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [
+        ("stdlib json (legacy)", stdlib_json),
+        ("model dump_json", response_model_dump_json),
+        ("model + FastJSON", response_model_served),
+    ]
+    if orjson is not None:
+        variants.append(("orjson dicts", orjson_dicts))
+
+    print(f"{'species':>8}  {'variant':<22} {'median ms':>10} {'peak MiB':>9} {'body MiB':>9}")
+    for size in args.sizes:
+        snakes = make_catalog(size, args.image_bytes, args.description_chars)
+        for name, fn in variants:
+            seconds, peak, body = measure(fn, snakes, args.repeat)
+            print(f"{size:>8}  {name:<22} {seconds * 1000:>10.1f} {peak / 2**20:>9.1f} {body / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
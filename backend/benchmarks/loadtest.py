@@ -0,0 +1,275 @@
+"""
+Offline load test.
+
+Boots the API with uvicorn against a throwaway SQLite database and tiny stub
+models (see stub_models.py), seeds a synthetic catalog, then drives a mix of
+identification, catalog, auth and admin traffic at increasing concurrency
+levels and reports throughput, tail latency and error rate for each.
+
+    python -m benchmarks.loadtest --snakes 500 --levels 1 8 32 --duration 10
+
+Needs httpx (pip install httpx) in addition to the app's requirements.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = {
+    "identify": 25,
+    "identify_related": 15,
+    "catalog_all": 5,
+    "related": 20,
+    "login": 10,
+    "admin_relations": 5,
+    "admin_update": 10,
+    "health": 10,
+}
+
+
+# ------------------------
+# Scenarios
+# ------------------------
+async def identify(client, ctx):
+    files = {"image": ("snake.jpg", ctx["image"], "image/jpeg")}
+    return await client.post("/snake/identify-snake", files=files)
+
+
+async def identify_related(client, ctx):
+    files = {"image": ("snake.jpg", ctx["image"], "image/jpeg")}
+    return await client.post("/snake-related/identify-with-related", files=files)
+
+
+async def catalog_all(client, ctx):
+    return await client.get("/snake/all")
+
+
+async def related(client, ctx):
+    return await client.get(f"/snake-related/related/{ctx['rng'].choice(ctx['main_ids'])}")
+
+
+async def login(client, ctx):
+    email = f"user{ctx['rng'].randrange(ctx['users'])}@loadtest.lk" if ctx["users"] else ctx["admin_email"]
+    return await client.post("/auth/login", json={"email": email, "password": ctx["password"]})
+
+
+async def admin_relations(client, ctx):
+    return await client.get("/snake-related/all-relations", headers=ctx["admin_headers"])
+
+
+async def admin_update(client, ctx):
+    snake_id = ctx["rng"].choice(ctx["related_ids"] or ctx["main_ids"])
+    data = {"snake_data": json.dumps({"snakeenglishname": f"Renamed {ctx['rng'].randrange(10**6)}"})}
+    return await client.put(f"/snake/update/{snake_id}", data=data, headers=ctx["admin_headers"])
+
+
+async def health(client, ctx):
+    return await client.get("/health")
+
+
+SCENARIOS = {
+    "identify": identify,
+    "identify_related": identify_related,
+    "catalog_all": catalog_all,
+    "related": related,
+    "login": login,
+    "admin_relations": admin_relations,
+    "admin_update": admin_update,
+    "health": health,
+}
+
+
+# ------------------------
+# Driver
+# ------------------------
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_level(httpx, base_url, ctx, mix, concurrency, duration, timeout):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = defaultdict(list)  # scenario -> [(latency, ok)]
+    deadline = time.perf_counter() + duration
+
+    async def user(seed):
+        rng = random.Random(seed)
+        user_ctx = dict(ctx, rng=rng)
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await SCENARIOS[name](client, user_ctx)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                results[name].append((time.perf_counter() - start, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(concurrency * 1000 + i) for i in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def report(concurrency, results, elapsed, mix):
+    rows = [(name, results[name]) for name in mix if name in results]
+    everything = [sample for samples in results.values() for sample in samples]
+    rows.append(("ALL", everything))
+    print(f"\n== concurrency {concurrency} ({elapsed:.1f}s) ==")
+    print(f"{'scenario':<18} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, samples in rows:
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        error_rate = errors / len(samples) if samples else 0.0
+        print(
+            f"{name:<18} {len(samples):>8} {len(samples) / elapsed:>8.1f} "
+            f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.1f} {error_rate:>6.1%}"
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(httpx, base_url, server, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("Server exited during start-up; see the server log")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"Server not ready after {timeout}s")
+
+
+def parse_mix(items):
+    if not items:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snakes", type=int, default=200, help="Catalog size to seed (>= 5)")
+    parser.add_argument("--users", type=int, default=50, help="Regular users to seed")
+    parser.add_argument("--image-size", type=int, default=224, help="Side of the seeded JPEGs in pixels")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--mix", nargs="*", help="Scenario weights, e.g. identify=5 related=2")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp directory (DB, models, server log)")
+    args = parser.parse_args()
+
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("The load test needs httpx: pip install httpx")
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="snake-loadtest-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        MODEL_DIR=os.path.join(workdir, "models"),
+        EMBEDDING_DIR=os.path.join(workdir, "embeddings"),
+        SNAPSHOT_DIR=os.path.join(workdir, "snapshot"),
+        RELATION_GRAPH_STAMP=os.path.join(workdir, "relation_graph.version"),
+        PROFILE_DIR=os.path.join(workdir, "profiles"),
+        MODEL_RELOAD_TRIGGER=os.path.join(workdir, "model_reload"),
+    )
+    # The app reads its configuration at import time, so set it before
+    # importing anything from it
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from benchmarks.seed import seed_database, PASSWORD, ADMIN_EMAIL, make_jpeg
+    from benchmarks.stub_models import write_stub_models
+    from core import migrations
+    from models.database import SessionLocal
+
+    server = None
+    log_path = os.path.join(workdir, "server.log")
+    try:
+        print(f"Working directory: {workdir}")
+        print("Writing stub models...")
+        write_stub_models(env["MODEL_DIR"])
+
+        print(f"Seeding {args.snakes} snakes and {args.users} users...")
+        migrations.upgrade()
+        db = SessionLocal()
+        try:
+            main_ids, related_ids = seed_database(db, args.snakes, args.users, args.image_size)
+        finally:
+            db.close()
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"Starting uvicorn with {args.workers} worker(s) on {base_url}...")
+        with open(log_path, "w") as log_file:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                 "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+            )
+        wait_ready(httpx, base_url, server, timeout=300)
+
+        token = httpx.post(
+            f"{base_url}/auth/login", json={"email": ADMIN_EMAIL, "password": PASSWORD}, timeout=30
+        ).json()["access_token"]
+        ctx = {
+            "image": make_jpeg(12345, args.image_size),
+            "main_ids": main_ids,
+            "related_ids": related_ids,
+            "users": args.users,
+            "password": PASSWORD,
+            "admin_email": ADMIN_EMAIL,
+            "admin_headers": {"Authorization": f"Bearer {token}"},
+        }
+
+        print(f"Mix: {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}")
+        for concurrency in args.levels:
+            results, elapsed = asyncio.run(
+                run_level(httpx, base_url, ctx, mix, concurrency, args.duration, args.timeout)
+            )
+            report(concurrency, results, elapsed, mix)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if args.keep:
+            print(f"\nKept {workdir} (server log: {log_path})")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic catalog, relations and users for load tests and benchmarks."""
+import io
+
+import numpy as np
+from PIL import Image
+
+from core.security import hash_password
+from models import models
+
+PASSWORD = "loadtest-password"
+ADMIN_EMAIL = "admin@loadtest.lk"
+
+DESCRIPTION_EN = "A nocturnal snake of the dry zone, often found near paddy fields and human dwellings. "
+DESCRIPTION_SI = "වියළි කලාපයේ කුඹුරු සහ නිවාස අසල බහුලව දක්නට ලැබෙන රාත්‍රී සර්පයෙකි. "
+
+
+def make_jpeg(seed: int, size: int = 224, quality: int = 85) -> bytes:
+    rng = np.random.default_rng(seed)
+    # Smooth noise compresses like a photo rather than like static
+    small = rng.integers(0, 255, (size // 8, size // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((size, size), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def seed_database(db, snakes: int, users: int, image_size: int = 224, fanout: int = None,
+                  description_repeat: int = 10):
+    """Insert the five main snakes, snakes - 5 related species and users.
+
+    Every snake gets its own image (seeded by its position), so response
+    sizes after compression are what distinct catalog photos would give.
+    By default every related species hangs off one of the main snakes. With
+    fanout set, each snake gets at most fanout related species and the rest
+    form a fanout-ary tree below them. Returns (main ids, related ids).
+    """
+    english = DESCRIPTION_EN * description_repeat
+    sinhala = DESCRIPTION_SI * description_repeat
+
+    main_snakes = []
+    for label in range(5):
+        snake = models.Snake(
+            snakeenglishname=f"Main snake {label}",
+            snakesinhalaname=f"ප්‍රධාන සර්පයා {label}",
+            snakeenglishdescription=english,
+            snakesinhaladescription=sinhala,
+            snakeimage=make_jpeg(label, image_size),
+            snakeimage_type="image/jpeg",
+            class_label=str(label),
+        )
+        db.add(snake)
+        main_snakes.append(snake)
+    db.flush()
+
+    related_ids = []
+    pending = []
+    for i in range(max(snakes - 5, 0)):
+        pending.append(models.Snake(
+            snakeenglishname=f"Related species {i}",
+            snakesinhalaname=f"සම්බන්ධ විශේෂය {i}",
+            snakeenglishdescription=english,
+            snakesinhaladescription=sinhala,
+            snakeimage=make_jpeg(5 + i, image_size),
+            snakeimage_type="image/jpeg",
+            class_label=None,
+        ))
+        if len(pending) == 200:
+            db.add_all(pending)
+            db.flush()
+            related_ids.extend(snake.snakeid for snake in pending)
+            pending = []
+    db.add_all(pending)
+    db.flush()
+    related_ids.extend(snake.snakeid for snake in pending)
+
+    main_ids = [snake.snakeid for snake in main_snakes]
+    for i, related_id in enumerate(related_ids):
+        if fanout is None:
+            parent_id = main_ids[i % len(main_ids)]
+        elif i < len(main_ids) * fanout:
+            parent_id = main_ids[i // fanout]
+        else:
+            parent_id = related_ids[(i - len(main_ids) * fanout) // fanout]
+        db.add(models.SnakeRelated(snakeid=parent_id, relatedsnakeid=related_id))
+
+    # bcrypt is slow on purpose; every seeded user shares one hash
+    hashed = hash_password(PASSWORD)
+    db.add(models.User(username=ADMIN_EMAIL, password=hashed, is_admin=True))
+    for i in range(users):
+        db.add(models.User(username=f"user{i}@loadtest.lk", password=hashed, is_admin=False))
+    db.commit()
+    return main_ids, related_ids
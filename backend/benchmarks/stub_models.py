@@ -0,0 +1,47 @@
+"""
+Tiny stand-ins for mobilenet.h5, pca_model.pkl and classifier.h5.
+
+They have the same interfaces as the real artifacts (224x224x3 images in,
+five class probabilities out) but load in milliseconds and need no training
+data, so the service can be exercised without the real model files.
+
+    python -m benchmarks.stub_models /tmp/stub-models
+"""
+import os
+import sys
+
+import numpy as np
+
+FEATURES = 256
+COMPONENTS = 100
+CLASSES = 5
+
+
+def write_stub_models(directory: str):
+    import joblib
+    import tensorflow as tf
+    from sklearn.decomposition import PCA
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(0)
+
+    mobilenet = tf.keras.Sequential([
+        tf.keras.Input((224, 224, 3)),
+        tf.keras.layers.AveragePooling2D(16),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(FEATURES),
+    ])
+    mobilenet.save(os.path.join(directory, "mobilenet.h5"))
+
+    pca = PCA(COMPONENTS).fit(rng.random((COMPONENTS * 2, FEATURES)))
+    joblib.dump(pca, os.path.join(directory, "pca_model.pkl"))
+
+    classifier = tf.keras.Sequential([
+        tf.keras.Input((COMPONENTS,)),
+        tf.keras.layers.Dense(CLASSES, activation="softmax"),
+    ])
+    classifier.save(os.path.join(directory, "classifier.h5"))
+
+
+if __name__ == "__main__":
+    write_stub_models(sys.argv[1] if len(sys.argv) > 1 else "stub_models")
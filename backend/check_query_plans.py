@@ -0,0 +1,48 @@
+"""
+EXPLAIN the hot queries and fail if any of them scans a whole table.
+
+Runs against DATABASE_URL by default. With --sqlite it applies the
+migrations to a throwaway SQLite database first, so it can run in CI
+without MySQL:
+
+    python check_query_plans.py --sqlite
+
+The queries and the plan check live in core/query_plans.py, which start-up
+also runs (warning only).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sqlite", action="store_true", help="Check a fresh migrated SQLite database")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        workdir = tempfile.mkdtemp(prefix="snake-explain-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'explain.db')}"
+
+    # Imported after DATABASE_URL is set: the engine is created on import
+    from core import migrations, query_plans
+
+    if args.sqlite:
+        migrations.upgrade()
+
+    failures = 0
+    for name, uses_index, plan in query_plans.check():
+        print(f"{'PASS' if uses_index else 'FAIL'}  {name}")
+        for line in plan:
+            print(f"      {line}")
+        failures += not uses_index
+
+    if failures:
+        print(f"\n{failures} hot quer{'y does' if failures == 1 else 'ies do'} not use an index")
+        sys.exit(1)
+    print("\nAll hot queries use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Classify every image under a directory, offline, with the same decoding and
+model pipeline as /snake/identify-snake.
+
+    python classify_images.py /data/photos -o results.csv
+    python classify_images.py /data/photos -o results.parquet --workers 8 --batch-size 512
+
+Images are decoded on a process pool while the previous batch runs through
+the model, and results are appended after every batch. Re-running the same
+command resumes: paths already in the output are skipped, including ones
+that failed to decode (their error column is set; --retry-errors tries them
+again and appends a new row, and the last row for a path wins).
+
+Parquet output (needs pyarrow) is written to <output>.part.csv while
+running and converted at the end.
+
+Output columns: path (relative to the directory), class_index, snake_name,
+snake_sinhala_name (from the catalog's main snakes), confidence,
+model_version, error.
+
+Uses the inference server when INFERENCE_SERVER_ADDRESS is set; otherwise
+loads the models in this process, with one --model-batch sized bucket.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tif", ".tiff")
+COLUMNS = ["path", "class_index", "snake_name", "snake_sinhala_name", "confidence", "model_version", "error"]
+
+
+def find_images(directory: str):
+    """Image paths under directory, relative to it, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+
+# ------------------------
+# Decoding (runs in the pool)
+# ------------------------
+def decode_file(path: str):
+    """(pixels, None) or (None, error) for one image file"""
+    from core import inference
+    try:
+        with open(path, "rb") as f:
+            return inference.decode_pixels(f.read()), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# ------------------------
+# Output and resuming
+# ------------------------
+def checkpoint_path(output: str) -> str:
+    return output + ".part.csv" if output.endswith(".parquet") else output
+
+
+def read_done(output: str, retry_errors: bool) -> set:
+    """Paths already in the output (and its checkpoint). A torn last line
+    left by an interruption is dropped first."""
+    rows = []
+    if output.endswith(".parquet") and os.path.exists(output):
+        import pyarrow.parquet
+        rows += pyarrow.parquet.read_table(output, columns=["path", "error"]).to_pylist()
+    checkpoint = checkpoint_path(output)
+    if os.path.exists(checkpoint):
+        with open(checkpoint, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+        with open(checkpoint, newline="", encoding="utf-8") as f:
+            rows += list(csv.DictReader(f))
+    # Later rows win: an errored path may have been retried since
+    errors = {row["path"]: bool(row["error"]) for row in rows}
+    return {path for path, error in errors.items() if not (retry_errors and error)}
+
+
+def write_parquet(output: str):
+    """Merge the checkpoint into the Parquet output, one row per path"""
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+
+    checkpoint = checkpoint_path(output)
+    rows = {}
+    if os.path.exists(output):
+        for row in pyarrow.parquet.read_table(output).to_pylist():
+            rows[row["path"]] = row
+    string_columns = {column: pyarrow.string() for column in COLUMNS if column not in ("class_index", "confidence")}
+    table = pyarrow.csv.read_csv(checkpoint, convert_options=pyarrow.csv.ConvertOptions(column_types=string_columns))
+    for row in table.to_pylist():
+        rows[row["path"]] = row
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(list(rows.values())), output + ".tmp")
+    os.replace(output + ".tmp", output)
+    os.remove(checkpoint)
+
+
+def snake_names() -> dict:
+    """class_label -> (English name, Sinhala name) for the main snakes"""
+    from sqlalchemy.orm import load_only
+    from models.database import SessionLocal
+    from models import models
+
+    db = SessionLocal()
+    try:
+        snakes = db.query(models.Snake).options(
+            load_only(models.Snake.class_label, models.Snake.snakeenglishname, models.Snake.snakesinhalaname)
+        ).filter(models.Snake.class_label.isnot(None)).all()
+        return {snake.class_label: (snake.snakeenglishname, snake.snakesinhalaname) for snake in snakes}
+    except Exception as e:
+        print(f"⚠️ Could not read snake names from the database ({e}); names will be empty")
+        return {}
+    finally:
+        db.close()
+
+
+# ------------------------
+# Driver
+# ------------------------
+def load_models():
+    from core import inference
+    from core.config import INFERENCE_SERVER_ADDRESS
+
+    if INFERENCE_SERVER_ADDRESS:
+        inference.connect_remote()
+    else:
+        inference.activate(inference.load_models())
+    if not inference.models_ready():
+        raise SystemExit("Models not loaded; cannot classify")
+
+
+def classify_directory(args):
+    from core import inference
+
+    checkpoint = checkpoint_path(args.output)
+    done = read_done(args.output, args.retry_errors)
+    paths = [path for path in find_images(args.directory) if path not in done]
+    print(f"{len(done)} images already classified, {len(paths)} to go")
+    if not paths:
+        return
+
+    names = snake_names()
+    load_models()
+    new_file = not os.path.exists(checkpoint) or os.path.getsize(checkpoint) == 0
+    batches = [paths[i:i + args.batch_size] for i in range(0, len(paths), args.batch_size)]
+
+    # spawn: the workers must not inherit a forked TensorFlow runtime
+    context = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    classified = failed = 0
+    last_report = started
+    with context.Pool(args.workers) as pool, open(checkpoint, "a", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        if new_file:
+            writer.writerow(COLUMNS)
+
+        def decode(batch):
+            full_paths = [os.path.join(args.directory, path) for path in batch]
+            return pool.map_async(decode_file, full_paths, chunksize=max(1, len(batch) // (4 * args.workers)))
+
+        # Decode batch n + 1 while batch n is in the model; at most two in memory
+        pending = decode(batches[0])
+        for n, batch in enumerate(batches):
+            decoded = pending.get()
+            if n + 1 < len(batches):
+                pending = decode(batches[n + 1])
+
+            ok = [i for i, (pixels, _) in enumerate(decoded) if pixels is not None]
+            rows = {}
+            if ok:
+                models = inference.active  # same set for the whole batch
+                preds = inference.classify(inference.scale_pixels(np.stack([decoded[i][0] for i in ok])), models=models)
+                version = inference.served_version(models)
+                for i, probabilities in zip(ok, preds):
+                    class_index = int(np.argmax(probabilities))
+                    name, sinhala_name = names.get(str(class_index), ("", ""))
+                    rows[i] = [batch[i], class_index, name, sinhala_name, f"{float(np.max(probabilities)):.6f}", version, ""]
+            for i, (pixels, error) in enumerate(decoded):
+                if pixels is None:
+                    rows[i] = [batch[i], "", "", "", "", "", error]
+            writer.writerows(rows[i] for i in range(len(batch)))
+            out.flush()
+
+            classified += len(ok)
+            failed += len(batch) - len(ok)
+            now = time.perf_counter()
+            if now - last_report >= args.report_every or n + 1 == len(batches):
+                last_report = now
+                done_count = classified + failed
+                print(f"  {done_count}/{len(paths)} images, {done_count / (now - started):.1f} images/s")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Classified {classified} images in {elapsed:.1f}s ({(classified + failed) / elapsed:.1f} images/s)"
+          + (f"; {failed} could not be decoded" if failed else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Directory to scan for images (recursively)")
+    parser.add_argument("-o", "--output", required=True, help="Results file, .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decoding processes")
+    parser.add_argument("--batch-size", type=int, default=256, help="Images decoded and written per batch")
+    parser.add_argument("--model-batch", type=int, default=64, help="Images per model call (local models only)")
+    parser.add_argument("--retry-errors", action="store_true", help="Try images that failed to decode again")
+    parser.add_argument("--report-every", type=float, default=10, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Not a directory: {args.directory}")
+    if not args.output.endswith((".csv", ".parquet")):
+        parser.error("Output must end in .csv or .parquet")
+    if args.output.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+
+    # One bucket the size of a model batch; the config is read on import
+    os.environ.setdefault("BATCH_BUCKETS", str(args.model_batch))
+    classify_directory(args)
+    if args.output.endswith(".parquet") and os.path.exists(checkpoint_path(args.output)):
+        write_parquet(args.output)
+        print(f"✅ Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Admission control for the identification endpoints.
+
+At most ADMISSION_CONCURRENCY requests per worker run the model at once;
+up to ADMISSION_MAX_QUEUE more wait for a slot, for at most
+ADMISSION_MAX_WAIT_S seconds. Anything beyond that is shed straight away
+with 503 + Retry-After instead of piling up behind TensorFlow, so latency
+stays bounded and the cheap endpoints keep answering.
+
+The model call itself runs in a worker thread, off the event loop. With a
+request deadline (core/deadlines.py) a request stops waiting as soon as the
+deadline passes or the client disconnects, and never starts the model.
+"""
+import asyncio
+import math
+import time
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from core import metrics, profiling
+from core.config import ADMISSION_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_S
+
+metrics.gauge("admission_queue_depth", "Requests waiting for an inference slot")
+metrics.gauge("admission_in_flight", "Requests currently running inference")
+metrics.histogram("admission_wait_seconds", "Time spent waiting for an inference slot")
+metrics.histogram("admission_service_seconds", "Time spent running inference once admitted")
+metrics.counter("admission_admitted_total", "Requests admitted to inference")
+metrics.counter("admission_shed_total", "Requests rejected with 503, by reason")
+
+
+class AdmissionQueue:
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.in_flight = 0
+        # Moving average of the service time, for Retry-After
+        self.service_time = 0.5
+        self._slots = None
+
+    def _update_gauges(self):
+        metrics.set_gauge("admission_queue_depth", self.waiting, queue=self.name)
+        metrics.set_gauge("admission_in_flight", self.in_flight, queue=self.name)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = self.waiting + self.in_flight
+        return max(1, math.ceil(backlog * self.service_time / self.concurrency))
+
+    def _shed(self, reason: str):
+        metrics.inc("admission_shed_total", queue=self.name, reason=reason)
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    async def _acquire(self, deadline) -> bool:
+        """Wait for a slot; False if max_wait, the deadline or a disconnect came first"""
+        wait = self.max_wait
+        waiters = {asyncio.ensure_future(self._slots.acquire())}
+        acquire = next(iter(waiters))
+        if deadline is not None:
+            wait = min(wait, max(0.0, deadline.remaining()))
+            waiters.add(asyncio.ensure_future(deadline.event.wait()))
+        done, pending = await asyncio.wait(waiters, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return acquire in done
+
+    async def run(self, fn, *args, deadline=None):
+        """Run fn(*args, deadline=deadline) in a thread once a slot is free.
+        Raises 503 when shedding, deadlines.Cancelled when no longer wanted."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        if deadline is not None:
+            deadline.check("admission")
+        if self.waiting + self.in_flight >= self.concurrency + self.max_queue:
+            self._shed("queue_full")
+
+        self.waiting += 1
+        self._update_gauges()
+        queued = time.perf_counter()
+        try:
+            acquired = await self._acquire(deadline)
+        finally:
+            self.waiting -= 1
+            self._update_gauges()
+        if not acquired:
+            metrics.observe("admission_wait_seconds", time.perf_counter() - queued, queue=self.name)
+            if deadline is not None:
+                deadline.check("queued")
+            self._shed("wait_timeout")
+        if deadline is not None:
+            try:
+                deadline.check("queued")
+            except Exception:
+                self._slots.release()
+                raise
+
+        started = time.perf_counter()
+        metrics.observe("admission_wait_seconds", started - queued, queue=self.name)
+        metrics.inc("admission_admitted_total", queue=self.name)
+        self.in_flight += 1
+        self._update_gauges()
+        try:
+            return await run_in_threadpool(profiling.profiled(fn), *args, deadline=deadline)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            metrics.observe("admission_service_seconds", elapsed, queue=self.name)
+            self.in_flight -= 1
+            self._update_gauges()
+            self._slots.release()
+
+
+identification = AdmissionQueue(
+    "identification", ADMISSION_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_S
+)
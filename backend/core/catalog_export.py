@@ -0,0 +1,232 @@
+"""
+Streaming catalog export / backup.
+
+Writes every snake, its image and the relations as a .zip or .tar.gz:
+
+    images/<snakeid>.<ext>   the stored image bytes
+    manifest.jsonl           one row per snake, in the format catalog_import
+                             reads, plus snakeid and updateddate (image is
+                             null for a snake without one)
+    relations.jsonl          {"snakeid": ..., "relatedsnakeid": ...}
+    export.json              counts, filters and the max snakeid / latest
+                             updateddate to pass as the next --since-*
+
+Rows come from the database in batches of YIELD_PER over a server-side
+cursor and each image is written out before the next one is fetched, so
+memory use does not depend on the size of the catalog. The JSONL members
+are spooled to temp files (tar needs a member's size up front).
+
+Incremental exports take since_id (snakes with a larger id) and/or since
+(snakes added or updated at or after that time). Relations touching an
+exported snake are included; removed relations are not tracked.
+"""
+import io
+import json
+import mimetypes
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import aliased
+
+from models import models
+
+YIELD_PER = 100
+FORMATS = {"zip": "application/zip", "tar": "application/gzip"}
+# Spooled members move from memory to disk past this size
+SPOOL_BYTES = 4 * 1024 * 1024
+
+
+class _StreamBuffer:
+    """Write-only file object whose contents are drained by the caller"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        if data:
+            self.chunks.append(bytes(data))
+            self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _ZipWriter:
+    def __init__(self, fileobj):
+        self.archive = zipfile.ZipFile(fileobj, "w")
+
+    def add_bytes(self, name, data, compress=False):
+        # Images are already compressed; deflating them again only costs CPU
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self.archive.writestr(info, data)
+
+    def add_file(self, name, spool):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.file_size = spool.seek(0, 2)
+        spool.seek(0)
+        with self.archive.open(info, "w") as member:
+            shutil.copyfileobj(spool, member)
+
+    def close(self):
+        self.archive.close()
+
+
+class _TarWriter:
+    def __init__(self, fileobj):
+        self.archive = tarfile.open(fileobj=fileobj, mode="w|gz")
+
+    def _info(self, name, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        return info
+
+    def add_bytes(self, name, data, compress=False):
+        self.archive.addfile(self._info(name, len(data)), io.BytesIO(data))
+
+    def add_file(self, name, spool):
+        size = spool.seek(0, 2)
+        spool.seek(0)
+        self.archive.addfile(self._info(name, size), spool)
+
+    def close(self):
+        self.archive.close()
+
+
+WRITERS = {"zip": _ZipWriter, "tar": _TarWriter}
+
+
+def _changed(since_id=None, since=None):
+    """Filter selecting the snakes an incremental export covers"""
+    conditions = []
+    if since_id is not None:
+        conditions.append(models.Snake.snakeid > since_id)
+    if since is not None:
+        conditions.append(models.Snake.updateddate >= since)
+    return or_(*conditions) if conditions else None
+
+
+def _image_name(snake_id, image_type):
+    extension = mimetypes.guess_extension(image_type or "") or ".bin"
+    return f"images/{snake_id}{extension}"
+
+
+def _jsonl(row: dict) -> bytes:
+    return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def filename(fmt: str) -> str:
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"snake-catalog-{stamp}.{'zip' if fmt == 'zip' else 'tar.gz'}"
+
+
+def iter_export(db, fmt: str = "zip", since_id=None, since=None):
+    """Yield the export archive as a sequence of byte chunks"""
+    if fmt not in WRITERS:
+        raise ValueError(f"format must be one of: {', '.join(WRITERS)}")
+
+    buffer = _StreamBuffer()
+    writer = WRITERS[fmt](buffer)
+    changed = _changed(since_id, since)
+
+    # A main snake parent lets catalog_import re-link a related species by
+    # class label; the exact pairs are in relations.jsonl either way
+    parent = aliased(models.Snake)
+    parent_label = (
+        select(parent.class_label)
+        .join(models.SnakeRelated, models.SnakeRelated.snakeid == parent.snakeid)
+        .where(models.SnakeRelated.relatedsnakeid == models.Snake.snakeid, parent.class_label.isnot(None))
+        .limit(1)
+        .scalar_subquery()
+    )
+    snakes = select(
+        models.Snake.snakeid,
+        models.Snake.snakeenglishname,
+        models.Snake.snakesinhalaname,
+        models.Snake.snakeenglishdescription,
+        models.Snake.snakesinhaladescription,
+        models.Snake.snakeimage,
+        models.Snake.snakeimage_type,
+        models.Snake.class_label,
+        models.Snake.updateddate,
+        parent_label.label("parent_class_label"),
+    ).order_by(models.Snake.snakeid)
+    if changed is not None:
+        snakes = snakes.where(changed)
+
+    stats = {"snakes": 0, "images": 0, "relations": 0, "max_snakeid": since_id, "latest_updateddate": None}
+    with tempfile.SpooledTemporaryFile(SPOOL_BYTES) as manifest, \
+            tempfile.SpooledTemporaryFile(SPOOL_BYTES) as relations:
+        for row in db.execute(snakes.execution_options(yield_per=YIELD_PER)):
+            image = None
+            if row.snakeimage:
+                image = _image_name(row.snakeid, row.snakeimage_type)
+                writer.add_bytes(image, row.snakeimage)
+                stats["images"] += 1
+            entry = {
+                "snakeid": row.snakeid,
+                "snakeenglishname": row.snakeenglishname,
+                "snakesinhalaname": row.snakesinhalaname,
+                "snakeenglishdescription": row.snakeenglishdescription,
+                "snakesinhaladescription": row.snakesinhaladescription,
+                "image": image,
+                "class_label": row.class_label,
+                "updateddate": row.updateddate.isoformat() if row.updateddate else None,
+            }
+            if row.class_label is None and row.parent_class_label is not None:
+                entry["parent_class_label"] = row.parent_class_label
+            manifest.write(_jsonl(entry))
+            stats["snakes"] += 1
+            stats["max_snakeid"] = row.snakeid
+            if row.updateddate and (stats["latest_updateddate"] is None or row.updateddate > stats["latest_updateddate"]):
+                stats["latest_updateddate"] = row.updateddate
+            if buffer.chunks:
+                yield buffer.drain()
+
+        pairs = select(models.SnakeRelated.snakeid, models.SnakeRelated.relatedsnakeid)
+        if changed is not None:
+            exported = select(models.Snake.snakeid).where(changed)
+            pairs = pairs.where(or_(
+                models.SnakeRelated.snakeid.in_(exported),
+                models.SnakeRelated.relatedsnakeid.in_(exported),
+            ))
+        for row in db.execute(pairs.execution_options(yield_per=YIELD_PER * 10)):
+            relations.write(_jsonl({"snakeid": row.snakeid, "relatedsnakeid": row.relatedsnakeid}))
+            stats["relations"] += 1
+
+        writer.add_file("manifest.jsonl", manifest)
+        yield buffer.drain()
+        writer.add_file("relations.jsonl", relations)
+        yield buffer.drain()
+
+    if stats["latest_updateddate"] is not None:
+        stats["latest_updateddate"] = stats["latest_updateddate"].isoformat()
+    meta = dict(
+        stats,
+        exported_at=datetime.now().isoformat(timespec="seconds"),
+        since_id=since_id,
+        since=since.isoformat() if since else None,
+    )
+    writer.add_bytes("export.json", json.dumps(meta, indent=2).encode("utf-8"), compress=True)
+    writer.close()
+    yield buffer.drain()
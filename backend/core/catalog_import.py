@@ -0,0 +1,322 @@
+"""
+Bulk catalog import from an archive of images plus a manifest.
+
+The archive is a .zip or .tar(.gz) holding the images and, unless a manifest
+is passed separately, a manifest.csv or manifest.jsonl. Each manifest row
+describes one snake:
+
+    snakeenglishname          required
+    snakesinhalaname          optional
+    snakeenglishdescription   optional
+    snakesinhaladescription   optional
+    image                     optional; path of the image inside the archive
+    class_label               0-4 for a main snake (no parent)
+    parent_snake_id           parent of a related species, or
+    parent_class_label        parent given by its class label
+
+A parent must already be in the catalog or appear earlier in the manifest.
+
+Rows are read and validated a chunk at a time, parents are resolved with one
+query per chunk and every chunk is committed on its own. Images are read
+from the archive one at a time, so memory use does not grow with the size
+of the archive. The result is a per-row report.
+"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import mimetypes
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from collections import Counter
+
+from PIL import Image
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+
+from core import catalog_snapshot, embeddings, inference
+from models import models
+
+CHUNK_SIZE = 200
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+VALID_CLASS_LABELS = {"0", "1", "2", "3", "4"}
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/bmp"}
+MANIFEST_NAMES = ("manifest.csv", "manifest.jsonl")
+# Compressed tar formats, by magic number
+COMPRESSIONS = ((b"\x1f\x8b", gzip.open), (b"BZh", bz2.open), (b"\xfd7zXZ\x00", lzma.open))
+
+
+class CatalogImportError(ValueError):
+    """The archive or manifest as a whole cannot be imported"""
+
+
+class _Archive:
+    """Uniform read access to zip and tar members without extracting"""
+
+    def __init__(self, fileobj):
+        self.temp = None
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            self.zip = zipfile.ZipFile(fileobj)
+            self.tar = None
+            self.names = {info.filename: info for info in self.zip.infolist() if not info.is_dir()}
+        else:
+            fileobj.seek(0)
+            fileobj = self._decompressed(fileobj)
+            try:
+                self.tar = tarfile.open(fileobj=fileobj, mode="r:")
+            except tarfile.TarError:
+                raise CatalogImportError("Archive must be a .zip or .tar(.gz) file")
+            self.zip = None
+            # Only headers are read here; member data is skipped over
+            self.names = {member.name: member for member in self.tar.getmembers() if member.isfile()}
+
+    def _decompressed(self, fileobj):
+        """A compressed tar is unpacked once into a temp file on disk. Reading
+        members out of order (the manifest between chunks of images) would
+        otherwise decompress the stream again from the start on every
+        backwards seek."""
+        magic = fileobj.read(6)
+        fileobj.seek(0)
+        for prefix, open_compressed in COMPRESSIONS:
+            if magic.startswith(prefix):
+                self.temp = tempfile.TemporaryFile()
+                try:
+                    with open_compressed(fileobj, "rb") as stream:
+                        shutil.copyfileobj(stream, self.temp, 1024 * 1024)
+                except (OSError, EOFError, lzma.LZMAError) as e:
+                    self.temp.close()
+                    raise CatalogImportError(f"Could not decompress the archive: {e}")
+                self.temp.seek(0)
+                return self.temp
+        return fileobj
+
+    def close(self):
+        (self.zip or self.tar).close()
+        if self.temp is not None:
+            self.temp.close()
+
+    def size(self, name: str) -> int:
+        entry = self.names[name]
+        return entry.file_size if self.zip else entry.size
+
+    def open(self, name: str):
+        entry = self.names[name]
+        return self.zip.open(entry) if self.zip else self.tar.extractfile(entry)
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as member:
+            return member.read()
+
+    def find_manifest(self):
+        for name in self.names:
+            if os.path.basename(name) in MANIFEST_NAMES:
+                return name
+        return None
+
+
+def iter_manifest(stream, name: str):
+    """Yield manifest rows as dicts from a binary stream"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    if name.endswith(".jsonl"):
+        for line in text:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(text)
+
+
+def _clean(row: dict) -> dict:
+    return {key.strip(): value.strip() if isinstance(value, str) else value
+            for key, value in row.items() if key}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _resolve_parents(db, chunk):
+    """Look up every parent referenced by a chunk with one query"""
+    ids = {str(row.get("parent_snake_id")) for _, row in chunk if row.get("parent_snake_id")}
+    labels = {str(row.get("parent_class_label")) for _, row in chunk if row.get("parent_class_label")}
+    by_id, by_label = {}, {}
+    conditions = []
+    int_ids = [int(value) for value in ids if value.isdigit()]
+    if int_ids:
+        conditions.append(models.Snake.snakeid.in_(int_ids))
+    if labels:
+        conditions.append(models.Snake.class_label.in_(labels))
+    if conditions:
+        parents = db.query(models.Snake).options(
+            load_only(models.Snake.snakeid, models.Snake.class_label)
+        ).filter(or_(*conditions)).all()
+        for parent in parents:
+            by_id[str(parent.snakeid)] = parent.snakeid
+            if parent.class_label is not None:
+                by_label.setdefault(str(parent.class_label), parent.snakeid)
+    return by_id, by_label
+
+
+def _validate(row, archive, by_id, by_label, used_labels):
+    """Return (parent, error) for a manifest row; parent is an id or a Snake"""
+    if not row.get("snakeenglishname"):
+        return None, "snakeenglishname is required"
+    image = row.get("image")
+    # Optional: snakes without an image are allowed, and exported that way
+    if image:
+        if image not in archive.names:
+            return None, f"image '{image}' not found in archive"
+        if archive.size(image) > MAX_IMAGE_BYTES:
+            return None, f"image '{image}' is larger than {MAX_IMAGE_BYTES} bytes"
+        if (mimetypes.guess_type(image)[0] or "") not in IMAGE_TYPES:
+            return None, f"image '{image}' is not a supported image type"
+
+    class_label = str(row["class_label"]) if row.get("class_label") not in (None, "") else None
+    parent_id = None
+    if row.get("parent_snake_id"):
+        parent_id = by_id.get(str(row["parent_snake_id"]))
+        if parent_id is None:
+            return None, f"parent snake {row['parent_snake_id']} not found"
+    elif row.get("parent_class_label"):
+        parent_id = by_label.get(str(row["parent_class_label"]))
+        if parent_id is None:
+            return None, f"no main snake with class_label {row['parent_class_label']}"
+
+    if parent_id is None:
+        if class_label not in VALID_CLASS_LABELS:
+            return None, "main snakes need a class_label of 0-4; related species need a parent"
+        if class_label in used_labels:
+            return None, f"a snake with class_label {class_label} already exists"
+    elif class_label is not None:
+        return None, "related species must not have a class_label"
+    return parent_id, None
+
+
+def import_catalog(db, archive_file, manifest_file=None, manifest_name="manifest.csv",
+                   chunk_size: int = CHUNK_SIZE, dry_run: bool = False):
+    """Import an archive into the catalog. Returns {"summary": ..., "rows": [...]}.
+
+    archive_file and manifest_file are seekable binary file objects.
+    """
+    archive = _Archive(archive_file)
+    try:
+        if manifest_file is None:
+            manifest_name = archive.find_manifest()
+            if manifest_name is None:
+                raise CatalogImportError("No manifest given and no manifest.csv / manifest.jsonl in the archive")
+            manifest_stream = archive.open(manifest_name)
+        else:
+            manifest_stream = manifest_file
+
+        used_labels = {
+            str(label) for (label,) in
+            db.query(models.Snake.class_label).filter(models.Snake.class_label.isnot(None)).distinct()
+        }
+        report = []
+        planned = {}  # dry run: main snakes validated in earlier chunks, by label
+
+        rows = ((number, _clean(row)) for number, row in enumerate(iter_manifest(manifest_stream, manifest_name), start=1))
+        for chunk in _chunks(rows, chunk_size):
+            by_id, by_label = _resolve_parents(db, chunk)
+            by_label.update(planned)
+            pending = []  # (row number, snake, parent id, image bytes)
+            for number, row in chunk:
+                parent_id, error = _validate(row, archive, by_id, by_label, used_labels)
+                image_content = None
+                if error is None and row.get("image"):
+                    image_content = archive.read(row["image"])
+                    try:
+                        Image.open(io.BytesIO(image_content)).verify()
+                    except Exception:
+                        error = f"image '{row['image']}' is not a valid image"
+                if error is not None:
+                    report.append({"row": number, "status": "error", "error": error})
+                    continue
+
+                class_label = str(row["class_label"]) if parent_id is None else None
+                snake = models.Snake(
+                    snakeenglishname=row["snakeenglishname"],
+                    snakesinhalaname=row.get("snakesinhalaname", ""),
+                    snakeenglishdescription=row.get("snakeenglishdescription", ""),
+                    snakesinhaladescription=row.get("snakesinhaladescription", ""),
+                    snakeimage=image_content,
+                    snakeimage_type=mimetypes.guess_type(row["image"])[0] if image_content else None,
+                    class_label=class_label,
+                )
+                if class_label is not None:
+                    # Later rows in this chunk may name this snake as their parent
+                    used_labels.add(class_label)
+                    by_label[class_label] = snake
+                pending.append((number, snake, parent_id, image_content))
+
+            if dry_run:
+                planned.update((snake.class_label, snake) for _, snake, _, _ in pending if snake.class_label is not None)
+                for number, _, _, _ in pending:
+                    report.append({"row": number, "status": "valid"})
+                continue
+
+            chunk_labels = {snake.class_label for _, snake, _, _ in pending if snake.class_label is not None}
+            try:
+                db.add_all([snake for _, snake, _, _ in pending])
+                db.flush()
+                # Ids now, while loaded: after the commit each access would
+                # reload the expired row, image included
+                pending = [
+                    (number, snake.snakeid, _parent_snakeid(parent), image)
+                    for number, snake, parent, image in pending
+                ]
+                db.add_all([
+                    models.SnakeRelated(snakeid=parent_id, relatedsnakeid=snakeid)
+                    for _, snakeid, parent_id, _ in pending if parent_id is not None
+                ])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Nothing from this chunk exists, so its labels are free again
+                used_labels -= chunk_labels
+                for number, _, _, _ in pending:
+                    report.append({"row": number, "status": "error", "error": f"chunk commit failed: {e}"})
+                continue
+
+            for number, snakeid, parent_id, _ in pending:
+                report.append({"row": number, "status": "created", "snakeid": snakeid, "parent_snakeid": parent_id})
+            _index_chunk(pending)
+
+        if any(entry["status"] == "created" for entry in report):
+            catalog_snapshot.catalog_changed()
+        report.sort(key=lambda entry: entry["row"])
+        summary = dict(Counter(entry["status"] for entry in report), rows=len(report), dry_run=dry_run)
+        return {"summary": summary, "rows": report}
+    finally:
+        archive.close()
+
+def _parent_snakeid(parent):
+    """Parents are ids, or Snake objects created earlier in the same chunk"""
+    return parent.snakeid if isinstance(parent, models.Snake) else parent
+
+
+def _index_chunk(pending):
+    """Add a committed chunk, (row, snakeid, parent id, image) tuples, to the
+    similarity index in one batch"""
+    pending = [entry for entry in pending if entry[3] is not None]
+    if not pending or not inference.models_ready():
+        return
+    try:
+        vectors = embeddings.embed_images([image for _, _, _, image in pending])
+        embeddings.index.add([snakeid for _, snakeid, _, _ in pending], vectors,
+                             model_version=inference.current_version())
+    except Exception as e:
+        print(f"❌ Could not index imported snakes: {e}")
@@ -0,0 +1,192 @@
+"""
+Prebuilt /snake/all payload.
+
+The catalog listing is read far more often than it changes, so the JSON body
+is rendered once, precompressed for every supported encoding and kept on
+disk. /snake/all serves the file for the client's Accept-Encoding with the
+snapshot version as its ETag, and answers 304 when the client already has it.
+
+Files in SNAPSHOT_DIR:
+    current.json          {"version": N, "digest": ..., "files": {"identity": ..., "gzip": ..., ...}}
+    catalog-N.json[.gz]   the snapshot bodies, one file per encoding
+
+Rebuilds happen after every change to the snakes and at start-up; relations
+are not part of the body, so relation-only writes don't trigger one. The
+version only goes up when the rendered body actually differs. New files are
+written first and current.json is swapped in with os.replace, so readers in
+any worker see either the old snapshot or the new one, never a partial one.
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from fastapi.responses import FileResponse, Response
+
+from core.compression import ENCODERS, choose_encoding
+from core.config import SNAPSHOT_DIR
+from core.responses import FastJSONResponse
+from models import models
+from models.database import SessionLocal
+from schemas.snake import SnakeOut
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+SUFFIXES = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+# Old versions are kept around briefly for requests still streaming them
+KEEP_VERSIONS = 2
+CACHE_CONTROL = "public, no-cache"
+YIELD_PER = 100
+
+
+def etag_matches(if_none_match: str, version: int) -> bool:
+    """Weak comparison (RFC 9110): W/"7" and "7" both match version 7"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == str(version):
+            return True
+    return False
+
+
+def render(db) -> bytes:
+    """The /snake/all body for the current catalog. Rows are streamed in
+    batches, so only YIELD_PER images are held at a time besides the body."""
+    snakes = db.query(models.Snake).order_by(models.Snake.snakeid).yield_per(YIELD_PER)
+    return FastJSONResponse([SnakeOut.from_snake(snake).model_dump() for snake in snakes]).body
+
+
+class CatalogSnapshot:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._current = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+        """One rebuild at a time across workers"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path("lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _write(self, name: str, data: bytes):
+        with open(self._path(name + ".tmp"), "wb") as f:
+            f.write(data)
+        os.replace(self._path(name + ".tmp"), self._path(name))
+
+    def _pointer(self):
+        """current.json as written, including an invalidated one"""
+        try:
+            stat = os.stat(self._path("current.json"))
+        except FileNotFoundError:
+            self._stamp = self._current = None
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with open(self._path("current.json")) as f:
+                self._current = json.load(f)
+            self._stamp = stamp
+        return self._current
+
+    def current(self):
+        """The live snapshot pointer, or None when there is no valid snapshot"""
+        pointer = self._pointer()
+        if pointer is None or not pointer.get("files"):
+            return None
+        return pointer
+
+    def rebuild(self) -> int:
+        """Render the catalog and publish it if it changed. Returns the version."""
+        with self._lock, self._file_lock():
+            # Rendered under the lock, so a rebuild that starts after a
+            # commit always sees that commit
+            db = SessionLocal()
+            try:
+                body = render(db)
+            finally:
+                db.close()
+
+            current = self._pointer()
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+            if current is not None and current["digest"] == digest:
+                return current["version"]
+
+            version = (current["version"] if current else 0) + 1
+            files = {"identity": f"catalog-{version}.json"}
+            self._write(files["identity"], body)
+            for encoding, encoder in ENCODERS.items():
+                files[encoding] = f"catalog-{version}.json{SUFFIXES[encoding]}"
+                self._write(files[encoding], encoder(body))
+            self._write("current.json", json.dumps({"version": version, "digest": digest, "files": files}).encode())
+            self._remove_older_than(version - KEEP_VERSIONS + 1)
+            print(f"✅ Catalog snapshot version {version} ({len(body)} bytes)")
+            return version
+
+    def invalidate(self):
+        """Stop serving the snapshot; /snake/all falls back to the database.
+        The version number is kept, so the next rebuild never reuses an ETag."""
+        with self._lock, self._file_lock():
+            current = self._pointer()
+            if current is None or not current.get("files"):
+                return
+            self._write("current.json", json.dumps({"version": current["version"], "digest": None, "files": None}).encode())
+
+    def _remove_older_than(self, version: int):
+        for name in os.listdir(self.directory):
+            if not name.startswith("catalog-"):
+                continue
+            try:
+                file_version = int(name[len("catalog-"):].split(".", 1)[0])
+            except ValueError:
+                continue
+            if file_version < version:
+                os.remove(self._path(name))
+
+    def response(self, current: dict, headers):
+        """FileResponse (or 304) for a request, given the current() pointer"""
+        version = current["version"]
+        etag = f'"{version}"'
+        common = {"Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding", "X-Catalog-Version": str(version)}
+        if etag_matches(headers.get("if-none-match", ""), version):
+            return Response(status_code=304, headers=dict(common, ETag=etag))
+
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+        if encoding in current["files"]:
+            # Same version, different bytes: a weak ETag, as the
+            # compression middleware would produce
+            return FileResponse(
+                self._path(current["files"][encoding]),
+                media_type="application/json",
+                headers=dict(common, ETag=f"W/{etag}", **{"Content-Encoding": encoding}),
+            )
+        return FileResponse(
+            self._path(current["files"]["identity"]),
+            media_type="application/json",
+            headers=dict(common, ETag=etag),
+        )
+
+
+snapshot = CatalogSnapshot(SNAPSHOT_DIR)
+
+
+def catalog_changed():
+    """Rebuild after a catalog write. Never raises: on failure the snapshot is
+    dropped so /snake/all serves live data instead of a stale file."""
+    try:
+        snapshot.rebuild()
+    except Exception as e:
+        print(f"❌ Could not rebuild catalog snapshot: {e}")
+        snapshot.invalidate()
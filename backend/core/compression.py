@@ -0,0 +1,212 @@
+"""
+Response compression with Accept-Encoding negotiation.
+
+Supports brotli and zstd when their packages are installed, gzip always.
+Responses below COMPRESSION_MIN_SIZE, streamed responses and content that is
+already compressed (JPEG images from /snake/image/{id}, archives, ...) are
+sent untouched. Compressed bodies of cacheable responses are kept in a small
+LRU keyed by the body hash, so an unchanged /snake/all payload is compressed
+once per encoding instead of on every request.
+"""
+import gzip
+import hashlib
+from collections import OrderedDict
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+from core.config import COMPRESSION_MIN_SIZE, COMPRESSION_CACHE_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies larger than this are compressed in a worker thread so the event
+# loop keeps serving other requests
+THREAD_THRESHOLD = 256 * 1024
+
+ALREADY_COMPRESSED = {
+    "application/gzip",
+    "application/zip",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/zstd",
+    "application/octet-stream",
+}
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=5)
+
+
+def _zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+
+# Server preference when the client weights several encodings equally
+ENCODERS = OrderedDict()
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+ENCODERS["gzip"] = _gzip
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODERS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    if not media_type or media_type in ALREADY_COMPRESSED:
+        return False
+    if media_type.startswith(("image/", "video/", "audio/", "font/woff")):
+        return media_type == "image/svg+xml"
+    return True
+
+
+def add_vary(headers: MutableHeaders, token: str):
+    """Add token to Vary unless it is already listed (or Vary is *)"""
+    listed = {value.strip().lower() for value in headers.get("vary", "").split(",")}
+    if token.lower() not in listed and "*" not in listed:
+        headers.add_vary_header(token)
+
+
+class _CompressedCache:
+    """LRU of compressed bodies bounded by total size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = _CompressedCache(cache_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            compressible = is_compressible(headers.get("content-type", ""))
+            if compressible:
+                add_vary(headers, "Accept-Encoding")
+            if (
+                message.get("more_body")  # streamed: don't buffer it
+                or not compressible
+                or "content-encoding" in headers
+                or start_message["status"] in (204, 304)
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = await self._compress(scope, start_message, headers, encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The compressed bytes differ from the identity ones
+                headers["ETag"] = f"W/{etag}"
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _compress(self, scope, start_message, headers, encoding: str, body: bytes) -> bytes:
+        cache_control = headers.get("cache-control", "").lower()
+        cacheable = (
+            scope["method"] in ("GET", "HEAD")
+            and start_message["status"] == 200
+            and "no-store" not in cache_control
+            and "private" not in cache_control
+        )
+        key = None
+        if cacheable:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        encoder = ENCODERS[encoding]
+        if len(body) > THREAD_THRESHOLD:
+            compressed = await anyio.to_thread.run_sync(encoder, body)
+        else:
+            compressed = encoder(body)
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
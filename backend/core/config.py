@@ -7,11 +7,99 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "snake_research")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+)
 # DATABASE_URL = "mysql+pymysql://root:@localhost:3306/snake_research"
 
+# Optional read replicas (comma-separated URLs) for the read-only endpoints,
+# and how long a client's reads stay on the primary after it writes
+DATABASE_REPLICA_URLS = [url for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url]
+REPLICA_STICKY_S = float(os.getenv("REPLICA_STICKY_S", 5))
+
 load_dotenv()  # read .env file
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+
+# Model artifacts used by the identification pipeline
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MOBILENET_PATH = os.getenv("MOBILENET_PATH", os.path.join(MODEL_DIR, "mobilenet.h5"))
+PCA_PATH = os.getenv("PCA_PATH", os.path.join(MODEL_DIR, "pca_model.pkl"))
+CLASSIFIER_PATH = os.getenv("CLASSIFIER_PATH", os.path.join(MODEL_DIR, "classifier.h5"))
+
+# Batch sizes the model is warmed up for at start-up. Inference batches are
+# padded up to the nearest of these so Keras reuses the already-traced graphs.
+BATCH_BUCKETS = sorted(int(size) for size in os.getenv("BATCH_BUCKETS", "1,4,8,16").split(","))
+
+# Most images one /snake/identify-tensor request may carry
+TENSOR_MAX_BATCH = int(os.getenv("TENSOR_MAX_BATCH", 16))
+
+# Optional out-of-process inference server(s). When set, web workers don't
+# load TensorFlow; they hand image tensors to the server over shared memory.
+# Comma-separated list of local socket paths (or named pipes on Windows).
+INFERENCE_SERVER_ADDRESS = os.getenv("INFERENCE_SERVER_ADDRESS", "")
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "snake-inference").encode()
+INFERENCE_BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", 5))
+
+# Admission control in front of the identification pipeline (per worker):
+# concurrent model calls, requests allowed to wait, and how long they wait
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", 2))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 16))
+ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", 5))
+
+# Identification deadline when the client sends no X-Request-Timeout, and
+# the most a client may ask for
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", 30))
+REQUEST_DEADLINE_MAX_S = float(os.getenv("REQUEST_DEADLINE_MAX_S", 60))
+
+# Memory-mapped embedding index used by /snake/similar
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", os.path.join("data", "embeddings"))
+
+# Prebuilt, precompressed /snake/all payload
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join("data", "snapshot"))
+
+# Response compression (brotli/zstd need their optional packages installed)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Hot model reload: how often workers poll the model files (0 = never), the
+# file the admin endpoint touches so every worker reloads, and the labelled
+# holdout images (<class_index>/<image>) a new model set must pass
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", 10))
+MODEL_RELOAD_TRIGGER = os.getenv("MODEL_RELOAD_TRIGGER", os.path.join("data", "model_reload"))
+MODEL_HOLDOUT_DIR = os.getenv("MODEL_HOLDOUT_DIR", os.path.join("data", "holdout"))
+MODEL_HOLDOUT_PER_CLASS = int(os.getenv("MODEL_HOLDOUT_PER_CLASS", 20))
+MODEL_RELOAD_MIN_ACCURACY = float(os.getenv("MODEL_RELOAD_MIN_ACCURACY", 0))
+MODEL_RELOAD_MAX_REGRESSION = float(os.getenv("MODEL_RELOAD_MAX_REGRESSION", 0.05))
+
+# Admin request profiling: where the last PROFILE_KEEP profiles are kept, and
+# the fraction of requests profiled without an X-Profile header (0 = off)
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+
+# Background jobs (core/jobs.py): worker threads per process, how often idle
+# workers poll the jobs table, retries with exponential backoff, how long a
+# running job may go without a heartbeat before it is requeued, and how long
+# succeeded jobs are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_S = float(os.getenv("JOB_POLL_S", 1))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BACKOFF_S = float(os.getenv("JOB_RETRY_BACKOFF_S", 5))
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", 300))
+JOB_KEEP_DAYS = float(os.getenv("JOB_KEEP_DAYS", 7))
+
+# Relation graph index (core/relation_graph.py): file rewritten on every
+# relation change so other workers know to reload their copy
+RELATION_GRAPH_STAMP = os.getenv("RELATION_GRAPH_STAMP", os.path.join("data", "relation_graph.version"))
+
+# Prediction log (core/prediction_log.py): off switch, rows per multi-row
+# insert, longest a row waits before being written, and the most rows held
+# in memory per worker (beyond that new predictions are dropped and counted)
+PREDICTION_LOG = os.getenv("PREDICTION_LOG", "1") not in ("0", "false", "False", "")
+PREDICTION_LOG_BATCH = int(os.getenv("PREDICTION_LOG_BATCH", 500))
+PREDICTION_LOG_FLUSH_S = float(os.getenv("PREDICTION_LOG_FLUSH_S", 2))
+PREDICTION_LOG_MAX_BUFFER = int(os.getenv("PREDICTION_LOG_MAX_BUFFER", 10000))
@@ -0,0 +1,90 @@
+"""
+Per-request deadlines for the identification endpoints.
+
+A client may send X-Request-Timeout (seconds from now); otherwise
+REQUEST_DEADLINE_S applies, and no request gets more than
+REQUEST_DEADLINE_MAX_S. The deadline also trips as soon as the client
+disconnects.
+
+Work is checked against the deadline at every stage boundary: before the
+request is queued, while it waits for an inference slot, between decoding,
+feature extraction and classification, inside the inference server's
+batcher, and before the related-species lookups. A model call that has
+already started runs to completion; everything after it is skipped.
+Every drop is counted in requests_cancelled_total by stage and reason.
+"""
+import asyncio
+import time
+
+from fastapi import HTTPException, Request
+
+from core import metrics
+from core.config import REQUEST_DEADLINE_S, REQUEST_DEADLINE_MAX_S
+
+metrics.counter("requests_cancelled_total", "Identification work dropped after its deadline passed or its client left")
+
+# nginx's "client closed request"; nobody is listening for it anyway
+CLIENT_CLOSED_REQUEST = 499
+
+
+class Cancelled(HTTPException):
+    """Raised where work stops because the deadline passed or the client left"""
+
+    def __init__(self, reason: str, stage: str):
+        super().__init__(
+            status_code=504 if reason == "deadline" else CLIENT_CLOSED_REQUEST,
+            detail=f"Request cancelled ({reason}) before {stage}",
+        )
+        self.reason = reason
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, timeout: float):
+        # Wall clock, so the inference server process can compare against it
+        self.expires_at = time.time() + timeout
+        self.reason = None
+        self.event = asyncio.Event()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.time()
+
+    def cancel(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+        self.event.set()
+
+    def check(self, stage: str):
+        """Raise Cancelled if the work about to start is no longer wanted"""
+        if self.reason is None and self.remaining() <= 0:
+            self.reason = "deadline"
+        if self.reason is not None:
+            metrics.inc("requests_cancelled_total", stage=stage, reason=self.reason)
+            raise Cancelled(self.reason, stage)
+
+
+def timeout_from_headers(headers) -> float:
+    try:
+        timeout = float(headers.get("x-request-timeout") or REQUEST_DEADLINE_S)
+    except ValueError:
+        timeout = REQUEST_DEADLINE_S
+    return max(0.0, min(timeout, REQUEST_DEADLINE_MAX_S))
+
+
+async def _watch_disconnect(request: Request, deadline: Deadline):
+    # The upload has been read by now, so the next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            deadline.cancel("disconnected")
+            return
+
+
+async def request_deadline(request: Request):
+    """Dependency: the request's Deadline, cancelled if the client goes away"""
+    deadline = Deadline(timeout_from_headers(request.headers))
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
@@ -0,0 +1,200 @@
+"""
+Visual similarity index over the catalog.
+
+Each catalog image is passed once through MobileNet + PCA and its reduced,
+L2-normalised vector is stored in a float32 matrix on disk that every worker
+memory-maps. A similarity query is then a single matrix-vector product.
+
+Files in EMBEDDING_DIR:
+    meta.json    {"dim": D, "model_version": V}, the model the vectors came from
+    vectors.f32  N x D float32, row-major
+    ids.i64      N snake ids, one per row. When a snake's image is replaced a
+                 new row is appended; the last row for an id wins.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from core import inference
+from core.config import EMBEDDING_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+class EmbeddingIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.valid = np.empty(0, dtype=bool)
+        self.count = 0
+        self.model_version = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Serialise writers across workers; readers only wait for writers"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path("lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _read_stamp(self):
+        try:
+            ids_stat = os.stat(self._path("ids.i64"))
+            vectors_stat = os.stat(self._path("vectors.f32"))
+        except FileNotFoundError:
+            return None
+        return (ids_stat.st_size, ids_stat.st_mtime_ns, vectors_stat.st_size, vectors_stat.st_mtime_ns)
+
+    def refresh(self):
+        """Re-map the files if they changed (e.g. another worker appended)"""
+        stamp = self._read_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with self._lock, self._file_lock(exclusive=False):
+            stamp = self._read_stamp()
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+            dim = meta["dim"]
+            ids = np.fromfile(self._path("ids.i64"), dtype=np.int64)
+            rows = min(len(ids), os.path.getsize(self._path("vectors.f32")) // (4 * dim))
+            ids = ids[:rows]
+            if rows:
+                vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, dim))
+            else:
+                vectors = np.empty((0, dim), dtype=np.float32)
+            # Keep only the last row written for each snake id
+            _, last = np.unique(ids[::-1], return_index=True)
+            valid = np.zeros(rows, dtype=bool)
+            valid[rows - 1 - last] = True
+            self.ids, self.vectors, self.valid = ids, vectors, valid
+            self.count = int(valid.sum())
+            self.model_version = meta.get("model_version")  # None: built before versions were kept
+            self._stamp = stamp
+
+    def built_with(self):
+        """Model version the index was built with, or None if unknown"""
+        self.refresh()
+        return self.model_version
+
+    def _check_meta(self, dim: int, model_version):
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f)
+            if stored["dim"] != dim:
+                raise ValueError(f"Embedding dimension {dim} does not match index dimension {stored['dim']}")
+            if stored.get("model_version") not in (None, model_version):
+                raise ValueError(f"Index holds model {stored['model_version']} vectors, not {model_version}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "model_version": model_version}, f)
+
+    def add(self, snake_ids, vectors: np.ndarray, model_version: str = None):
+        """Append (or replace) the vectors for the given snake ids. Raises
+        ValueError if the index was built with another model version."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock(exclusive=True):
+            self._check_meta(vectors.shape[1], model_version)
+            # Vectors first: readers only count rows that have an id
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._path("ids.i64"), "ab") as f:
+                f.write(np.asarray(snake_ids, dtype=np.int64).tobytes())
+
+    def rebuild(self, snake_ids, vectors: np.ndarray, model_version: str = None):
+        """Replace the whole index (backfill command and re-embed job)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock(exclusive=True):
+            for name in ("meta.json", "vectors.f32", "ids.i64"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._check_meta(vectors.shape[1], model_version)
+            vectors.tofile(self._path("vectors.f32.tmp"))
+            np.asarray(snake_ids, dtype=np.int64).tofile(self._path("ids.i64.tmp"))
+            os.replace(self._path("vectors.f32.tmp"), self._path("vectors.f32"))
+            os.replace(self._path("ids.i64.tmp"), self._path("ids.i64"))
+
+    def search(self, query: np.ndarray, k: int):
+        """Return up to k (snake_id, cosine similarity) pairs, best first"""
+        self.refresh()
+        k = min(k, self.count)
+        if k <= 0:
+            return []
+        scores = self.vectors @ query.astype(np.float32)
+        scores[~self.valid] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+
+index = EmbeddingIndex(EMBEDDING_DIR)
+
+
+def embed_images(contents, deadline=None) -> np.ndarray:
+    """Return L2-normalised MobileNet + PCA vectors for a list of image bytes"""
+    return embed_arrays(np.stack([inference.decode_image(content) for content in contents]), deadline)
+
+
+def embed_arrays(batch: np.ndarray, deadline=None) -> np.ndarray:
+    """Return L2-normalised MobileNet + PCA vectors for decoded images"""
+    features = inference.extract_features(batch, deadline).astype(np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
+
+def embed_catalog(progress=None):
+    """(snake ids, vectors) for every decodable catalog image, embedded in
+    batches of the largest bucket. progress(done) is called after each batch."""
+    from sqlalchemy.orm import load_only
+    from core.config import BATCH_BUCKETS
+    from models import models
+    from models.database import SessionLocal
+
+    db = SessionLocal()
+    snake_ids, vectors = [], []
+    pending_ids, pending_arrays = [], []
+
+    def flush():
+        if not pending_ids:
+            return
+        vectors.append(embed_arrays(np.stack(pending_arrays)))
+        snake_ids.extend(pending_ids)
+        pending_ids.clear()
+        pending_arrays.clear()
+        if progress is not None:
+            progress(len(snake_ids))
+
+    try:
+        query = db.query(models.Snake).options(
+            load_only(models.Snake.snakeid, models.Snake.snakeimage)
+        ).filter(models.Snake.snakeimage.isnot(None)).yield_per(BATCH_BUCKETS[-1])
+        for snake in query:
+            try:
+                pending_arrays.append(inference.decode_image(snake.snakeimage))
+            except Exception as e:
+                print(f"Skipping snake {snake.snakeid}: {e}")
+                continue
+            pending_ids.append(snake.snakeid)
+            if len(pending_ids) >= BATCH_BUCKETS[-1]:
+                flush()
+        flush()
+    finally:
+        db.close()
+    if not vectors:
+        # Still need the width, so an empty index can be written
+        probe = embed_arrays(np.zeros((1, *inference.IMAGE_SIZE, 3), dtype=np.float32))
+        return [], np.empty((0, probe.shape[1]), dtype=np.float32)
+    return snake_ids, np.concatenate(vectors)
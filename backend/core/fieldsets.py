@@ -0,0 +1,106 @@
+"""
+Sparse fieldsets (fields=) and language selection (lang=) for catalog responses.
+
+    /snake/all?fields=snakeid,snakeenglishname
+    /snake/all?fields=name,image_data&lang=si
+    /snake/all?lang=en
+
+fields is a comma-separated list of SnakeOut fields. "name" and
+"description" stand for the English and/or Sinhala columns chosen by lang
+(en, si or en,si; default both). lang on its own drops the other language's
+fields from the full entry; fields named explicitly, such as
+snakeenglishname with lang=si, are always included. snakeid is always
+included.
+
+Only the columns behind the selected fields are loaded (load_only, so the
+description Text columns and the image blob stay deferred and are never
+read) and only the selected fields are serialized.
+"""
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import load_only
+
+from models import models
+from schemas.snake import image_data_url
+
+# Output field -> Snake columns it is built from, in SnakeOut order
+FIELD_COLUMNS = {
+    "snakeid": ("snakeid",),
+    "snakeenglishname": ("snakeenglishname",),
+    "snakesinhalaname": ("snakesinhalaname",),
+    "snakeenglishdescription": ("snakeenglishdescription",),
+    "snakesinhaladescription": ("snakesinhaladescription",),
+    "class_label": ("class_label",),
+    "image_data": ("snakeimage", "snakeimage_type"),
+}
+FIELD_LANGUAGE = {
+    "snakeenglishname": "en",
+    "snakeenglishdescription": "en",
+    "snakesinhalaname": "si",
+    "snakesinhaladescription": "si",
+}
+ALIASES = {
+    "name": {"en": "snakeenglishname", "si": "snakesinhalaname"},
+    "description": {"en": "snakeenglishdescription", "si": "snakesinhaladescription"},
+}
+LANGUAGES = ("en", "si")
+
+
+class FieldSet:
+    def __init__(self, fields):
+        self.fields = [field for field in FIELD_COLUMNS if field in fields]
+
+    def options(self):
+        """Query option loading only the selected fields' columns"""
+        columns = {column for field in self.fields for column in FIELD_COLUMNS[field]}
+        return load_only(*[getattr(models.Snake, column) for column in sorted(columns)])
+
+    def serialize(self, snake, **extra) -> dict:
+        data = {}
+        for field in self.fields:
+            if field == "image_data":
+                data[field] = image_data_url(snake)
+            elif field == "class_label":
+                data[field] = str(snake.class_label) if snake.class_label is not None else None
+            else:
+                data[field] = getattr(snake, field)
+        data.update(extra)
+        return data
+
+
+def parse_languages(lang: Optional[str]) -> tuple:
+    """Language codes from a lang= parameter (default both)"""
+    if not lang:
+        return LANGUAGES
+    languages = tuple(code.strip().lower() for code in lang.split(",") if code.strip())
+    unknown = [code for code in languages if code not in LANGUAGES]
+    if unknown or not languages:
+        raise HTTPException(status_code=400, detail=f"Unknown lang {', '.join(unknown) or lang!r}; use en, si or en,si")
+    return languages
+
+
+def parse(fields: Optional[str], lang: Optional[str]) -> Optional[FieldSet]:
+    """FieldSet for the query parameters, or None for the full default entry"""
+    if not fields and not lang:
+        return None
+
+    languages = parse_languages(lang)
+
+    if fields:
+        selected = {"snakeid"}
+        for name in (name.strip() for name in fields.split(",")):
+            if not name:
+                continue
+            if name in ALIASES:
+                selected.update(ALIASES[name][code] for code in languages)
+            elif name in FIELD_COLUMNS:
+                selected.add(name)
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown field {name!r}; valid fields: {', '.join([*FIELD_COLUMNS, *ALIASES])}",
+                )
+    else:
+        selected = {field for field in FIELD_COLUMNS if FIELD_LANGUAGE.get(field, languages[0]) in languages}
+    return FieldSet(selected)
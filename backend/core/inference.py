@@ -0,0 +1,267 @@
+import hashlib
+import io
+import time
+import numpy as np
+from PIL import Image
+
+from core import metrics, prediction_log
+from core.config import MOBILENET_PATH, PCA_PATH, CLASSIFIER_PATH, BATCH_BUCKETS, INFERENCE_SERVER_ADDRESS
+
+IMAGE_SIZE = (224, 224)
+TENSOR_BYTES = IMAGE_SIZE[0] * IMAGE_SIZE[1] * 3
+NPY_MAGIC = b"\x93NUMPY"
+
+metrics.counter("identifications_total", "Images identified, by model version")
+
+# ------------------------
+# Loaded models
+# ------------------------
+# active stays None until a model set is loaded and activated (from the app
+# lifespan). TensorFlow is only imported inside the loaders, so importing
+# this module (or any router) does not pull TensorFlow into the process.
+class ModelSet:
+    """One loaded generation of the three models. Never modified: a reload
+    builds a new ModelSet and activate() swaps it in with one assignment, so
+    a request that picked up the old set finishes on it."""
+
+    def __init__(self, mobilenet, pca, classifier, version: str):
+        self.mobilenet = mobilenet
+        self.pca = pca
+        self.classifier = classifier
+        self.version = version
+
+
+active = None
+
+# RemoteClassifier when INFERENCE_SERVER_ADDRESS is set; the models then
+# live in core/inference_server.py and this process never loads them.
+remote = None
+remote_status = {"models_loaded": False, "warmed": False}
+
+
+def import_backend():
+    """Import TensorFlow and joblib. Split out so start-up can time it."""
+    import tensorflow as tf
+    import joblib
+    return tf, joblib
+
+
+def load_mobilenet(path: str = MOBILENET_PATH):
+    tf, _ = import_backend()
+    mobilenet = tf.keras.models.load_model(path)
+    print("✅ MobileNet loaded")
+    return mobilenet
+
+
+def load_pca(path: str = PCA_PATH):
+    _, joblib = import_backend()
+    pca = joblib.load(path)
+    print("✅ PCA loaded")
+    return pca
+
+
+def load_classifier(path: str = CLASSIFIER_PATH):
+    tf, _ = import_backend()
+    classifier = tf.keras.models.load_model(path)
+    print("✅ Classifier loaded")
+    return classifier
+
+
+def model_version(paths=(MOBILENET_PATH, PCA_PATH, CLASSIFIER_PATH)) -> str:
+    """Short content hash of the model files"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_models() -> ModelSet:
+    """Load all three models from the configured paths"""
+    version = model_version()
+    return ModelSet(load_mobilenet(), load_pca(), load_classifier(), version)
+
+
+def activate(models: ModelSet):
+    global active
+    active = models
+    print(f"✅ Model version {models.version} active")
+
+
+def connect_remote():
+    global remote
+    from core.inference_server import RemoteClassifier
+    remote = RemoteClassifier(INFERENCE_SERVER_ADDRESS.split(","))
+    refresh_remote_status()
+
+
+def refresh_remote_status() -> dict:
+    global remote_status
+    try:
+        remote_status = remote.status()
+    except Exception:
+        remote_status = {"models_loaded": False, "warmed": False}
+    return remote_status
+
+
+def models_ready() -> bool:
+    if remote is not None:
+        return remote_status["models_loaded"]
+    return active is not None
+
+
+def current_version():
+    if remote is not None:
+        return remote_status.get("model_version")
+    return active.version if active is not None else None
+
+
+def served_version(models) -> str:
+    """Version that answered this thread's last classify() with models"""
+    if models is None and remote is not None:
+        return remote.last_version()
+    return models.version
+
+
+# ------------------------
+# Pipeline
+# ------------------------
+def decode_pixels(image_content: bytes) -> np.ndarray:
+    """Decode image bytes into (224, 224, 3) uint8 RGB, before scaling"""
+    return np.asarray(Image.open(io.BytesIO(image_content)).convert("RGB").resize(IMAGE_SIZE))
+
+
+def scale_pixels(pixels: np.ndarray) -> np.ndarray:
+    """uint8 pixels (one image or a batch) to float32 scaled to [0, 1]"""
+    return pixels.astype(np.float32) / 255.0
+
+
+def decode_image(image_content: bytes, out: np.ndarray = None) -> np.ndarray:
+    """Decode image bytes into a (224, 224, 3) float32 array scaled to [0, 1].
+    Pass out to decode into an existing buffer instead of a new array."""
+    pixels = decode_pixels(image_content)
+    if out is None:
+        return scale_pixels(pixels)
+    return np.multiply(pixels, 1 / 255.0, out=out)
+
+
+def decode_tensor(content: bytes) -> np.ndarray:
+    """Validate already-resized 224x224 uint8 RGB data, raw or .npy, one
+    image or a batch. Returns a (N, 224, 224, 3) uint8 view; no PIL involved."""
+    if content[:6] == NPY_MAGIC:
+        array = np.load(io.BytesIO(content), allow_pickle=False)
+        if array.dtype != np.uint8:
+            raise ValueError(f"Tensor dtype must be uint8, got {array.dtype}")
+    else:
+        if not content or len(content) % TENSOR_BYTES:
+            raise ValueError(f"Raw tensor data must be a multiple of {TENSOR_BYTES} bytes (224x224x3 uint8)")
+        array = np.frombuffer(content, dtype=np.uint8)
+    if array.ndim == 3:
+        array = array[np.newaxis, ...]
+    if array.ndim == 1:
+        array = array.reshape(-1, *IMAGE_SIZE, 3)
+    if array.shape[1:] != (*IMAGE_SIZE, 3) or not len(array):
+        raise ValueError(f"Tensor shape must be (224, 224, 3) or (N, 224, 224, 3), got {array.shape}")
+    return array
+
+
+def bucket_size(n: int) -> int:
+    """Smallest configured batch bucket that fits n images"""
+    for size in BATCH_BUCKETS:
+        if size >= n:
+            return size
+    return BATCH_BUCKETS[-1]
+
+
+def pad_to_bucket(batch: np.ndarray) -> np.ndarray:
+    """Zero-pad a batch (at most the largest bucket) up to its bucket size"""
+    size = bucket_size(len(batch))
+    if size == len(batch):
+        return batch
+    padding = np.zeros((size - len(batch), *batch.shape[1:]), dtype=batch.dtype)
+    return np.concatenate([batch, padding])
+
+
+def _run_bucketed(batch: np.ndarray, fn) -> np.ndarray:
+    """Apply fn to batch in bucket-sized chunks and drop the padding rows"""
+    largest = BATCH_BUCKETS[-1]
+    outputs = []
+    for start in range(0, len(batch), largest):
+        chunk = batch[start:start + largest]
+        outputs.append(fn(pad_to_bucket(chunk))[:len(chunk)])
+    return np.concatenate(outputs)
+
+
+def _extract(padded: np.ndarray, models: ModelSet) -> np.ndarray:
+    features = models.mobilenet.predict(padded, batch_size=len(padded), verbose=0)
+    features = features.reshape(features.shape[0], -1)
+    return models.pca.transform(features)
+
+
+def _classify(padded: np.ndarray, models: ModelSet, deadline=None) -> np.ndarray:
+    features = _extract(padded, models)
+    if deadline is not None:
+        deadline.check("classify")
+    return models.classifier.predict(features, batch_size=len(padded), verbose=0)
+
+
+def extract_features(batch: np.ndarray, deadline=None, models: ModelSet = None) -> np.ndarray:
+    """Run a (N, 224, 224, 3) batch through MobileNet + PCA.
+    deadline (core/deadlines.py) is checked before each model stage;
+    models defaults to the active set."""
+    if deadline is not None:
+        deadline.check("extract")
+    if remote is not None and models is None:
+        return remote.extract_features(batch, deadline)
+    models = models or active
+    return _run_bucketed(batch, lambda padded: _extract(padded, models))
+
+
+def classify(batch: np.ndarray, deadline=None, models: ModelSet = None) -> np.ndarray:
+    """Return class probabilities for a (N, 224, 224, 3) batch"""
+    if deadline is not None:
+        deadline.check("extract")
+    if remote is not None and models is None:
+        return remote.classify(batch, deadline)
+    models = models or active
+    return _run_bucketed(batch, lambda padded: _classify(padded, models, deadline))
+
+
+def preprocess_image(image_content: bytes) -> np.ndarray:
+    """Decode a single image and return its PCA-reduced features"""
+    arr = decode_image(image_content)[np.newaxis, ...]  # add batch dim
+    return extract_features(arr)
+
+
+def identify(image_content: bytes, deadline=None):
+    """Classify a single image, returning (class_index, confidence, model_version)"""
+    started = time.perf_counter()
+    models = active  # a reload mid-request doesn't change which set answers
+    preds = classify(decode_image(image_content)[np.newaxis, ...], deadline, models)
+    version = served_version(models)
+    metrics.inc("identifications_total", model_version=version)
+    prediction_log.record(image_content, preds[0], time.perf_counter() - started, version, "image")
+    return int(np.argmax(preds, axis=1)[0]), float(np.max(preds)), version
+
+
+def identify_tensor(images: np.ndarray, deadline=None):
+    """Classify a (N, 224, 224, 3) uint8 batch from decode_tensor(), returning
+    ([(class_index, confidence), ...], model_version)"""
+    started = time.perf_counter()
+    models = active
+    batch = np.multiply(images, 1 / 255.0, dtype=np.float32)
+    preds = classify(batch, deadline, models)
+    version = served_version(models)
+    metrics.inc("identifications_total", len(images), model_version=version)
+    latency = time.perf_counter() - started
+    for image, probabilities in zip(images, preds):
+        prediction_log.record(image, probabilities, latency, version, "tensor")
+    results = [(int(idx), float(conf)) for idx, conf in zip(np.argmax(preds, axis=1), np.max(preds, axis=1))]
+    return results, version
+
+
+def warm_up_bucket(size: int, models: ModelSet = None):
+    """Push a synthetic batch of the given bucket size through the pipeline
+    so real requests of that shape don't pay for Keras tracing."""
+    classify(np.zeros((size, *IMAGE_SIZE, 3), dtype=np.float32), models=models)
@@ -0,0 +1,335 @@
+"""
+Out-of-process inference server.
+
+One server process owns the TensorFlow runtime and the models; any number of
+uvicorn workers on the same host talk to it over a local socket. Image tensors
+travel through a shared-memory segment owned by each client connection, so
+only a tiny control message goes over the socket. Requests arriving from
+different connections within INFERENCE_BATCH_WAIT_MS are classified together.
+
+Run one process per address:
+
+    python -m core.inference_server --address /tmp/snake-inference.sock
+
+and point the web workers at it with INFERENCE_SERVER_ADDRESS.
+"""
+import argparse
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from core import inference, model_reload
+from core.config import INFERENCE_AUTHKEY, INFERENCE_BATCH_WAIT_MS, BATCH_BUCKETS
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a client's segment without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class Expired(RuntimeError):
+    """The server dropped a request whose deadline had passed"""
+
+
+# ------------------------
+# Client side (web workers)
+# ------------------------
+class _Channel:
+    """One socket connection plus the shared-memory segment it writes into"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.conn = Client(address, authkey=authkey)
+        self.shm = None
+        self.model_version = None  # version that answered the last run()
+
+    def call(self, *message):
+        self.conn.send(message)
+        status, payload = self.conn.recv()
+        if status == "expired":
+            raise Expired(payload)
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def run(self, op: str, batch: np.ndarray, expires_at=None) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.shm is None or self.shm.size < batch.nbytes:
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=batch.nbytes)
+        np.ndarray(batch.shape, dtype=np.float32, buffer=self.shm.buf)[:] = batch
+        output, self.model_version = self.call(op, self.shm.name, batch.shape, expires_at)
+        return output
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self._release()
+        self.conn.close()
+
+
+class RemoteClassifier:
+    """Drop-in for the in-process classify() that forwards to the server(s)"""
+
+    def __init__(self, addresses, authkey: bytes = INFERENCE_AUTHKEY):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self._local = threading.local()
+        self._round_robin = itertools.count()
+        self._channels = []
+        atexit.register(self.close)
+
+    def _channel(self) -> _Channel:
+        channel = getattr(self._local, "channel", None)
+        if channel is None:
+            address = self.addresses[next(self._round_robin) % len(self.addresses)]
+            channel = _Channel(address, self.authkey)
+            self._local.channel = channel
+            self._channels.append(channel)
+        return channel
+
+    def _with_channel(self, fn):
+        try:
+            return fn(self._channel())
+        except (OSError, EOFError):
+            # Server restarted or went away; reconnect on the next call
+            channel = getattr(self._local, "channel", None)
+            self._local.channel = None
+            if channel is not None:
+                self._channels.remove(channel)
+                try:
+                    channel.close()
+                except Exception:
+                    pass
+            raise
+
+    def close(self):
+        """Close every connection and unlink the shared-memory segments"""
+        for channel in self._channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+        self._channels.clear()
+
+    def status(self) -> dict:
+        return self._with_channel(lambda channel: channel.call("status"))
+
+    def last_version(self):
+        """Model version that answered this thread's last request"""
+        channel = getattr(self._local, "channel", None)
+        return channel.model_version if channel is not None else None
+
+    def reload(self) -> list:
+        """Ask every server to reload its models; one reply per address"""
+        replies = []
+        for address in self.addresses:
+            try:
+                channel = _Channel(address, self.authkey)
+                try:
+                    replies.append(dict(channel.call("reload"), address=address))
+                finally:
+                    channel.close()
+            except Exception as e:
+                replies.append({"address": address, "status": "error", "error": str(e)})
+        return replies
+
+    def _run(self, op: str, batch: np.ndarray, deadline) -> np.ndarray:
+        expires_at = deadline.expires_at if deadline is not None else None
+        try:
+            return self._with_channel(lambda channel: channel.run(op, batch, expires_at))
+        except Expired:
+            deadline.check("inference_server")
+            raise  # clocks disagree; report it as a plain failure
+
+    def classify(self, batch: np.ndarray, deadline=None) -> np.ndarray:
+        return self._run("classify", batch, deadline)
+
+    def extract_features(self, batch: np.ndarray, deadline=None) -> np.ndarray:
+        return self._run("extract", batch, deadline)
+
+
+# ------------------------
+# Server side
+# ------------------------
+class _Batcher:
+    """Collects requests from all connections into bucket-sized batches.
+
+    Requests whose deadline (wall-clock expires_at) has passed are dropped
+    before a batch is formed, and get no result copied back if it passes
+    while their batch runs. Each batch runs on the model set that is active
+    when it starts; results carry that set's version."""
+
+    def __init__(self, fn, max_wait: float):
+        self.fn = fn
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, name="batcher", daemon=True).start()
+
+    def submit(self, batch: np.ndarray, expires_at=None) -> Future:
+        future = Future()
+        self.requests.put((batch, future, expires_at))
+        return future
+
+    @staticmethod
+    def _expired(expires_at) -> bool:
+        return expires_at is not None and expires_at <= time.time()
+
+    def _collect(self):
+        items = [self.requests.get()]
+        size = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < BATCH_BUCKETS[-1]:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = []
+            for batch, future, expires_at in self._collect():
+                if self._expired(expires_at):
+                    future.set_exception(Expired("deadline passed while queued"))
+                else:
+                    items.append((batch, future, expires_at))
+            if not items:
+                continue
+            try:
+                if len(items) == 1:
+                    batch = items[0][0]
+                else:
+                    batch = np.concatenate([batch for batch, _, _ in items])
+                models = inference.active
+                output = self.fn(batch, models=models)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for batch, future, expires_at in items:
+                if self._expired(expires_at):
+                    future.set_exception(Expired("deadline passed during inference"))
+                else:
+                    future.set_result((output[offset:offset + len(batch)], models.version))
+                offset += len(batch)
+
+
+def _serve_connection(conn, batchers: dict, state: dict):
+    segment = None
+    try:
+        while True:
+            message = conn.recv()
+            try:
+                if message[0] == "status":
+                    conn.send(("ok", dict(state, model_version=inference.current_version())))
+                elif message[0] == "reload":
+                    model_reload.request_reload("inference_server")
+                    conn.send(("ok", model_reload.status()))
+                elif message[0] in batchers:
+                    op, name, shape, expires_at = message
+                    if not state["models_loaded"]:
+                        raise RuntimeError("Models not loaded")
+                    if segment is None or segment.name != name:
+                        if segment is not None:
+                            segment.close()
+                        segment = _attach(name)
+                    # One copy out of the segment: the batcher may still hold
+                    # the array after we reply and the client reuses the buffer.
+                    batch = np.ndarray(shape, dtype=np.float32, buffer=segment.buf).copy()
+                    conn.send(("ok", batchers[op].submit(batch, expires_at).result()))
+                else:
+                    conn.send(("error", f"Unknown request: {message[0]}"))
+            except Expired as e:
+                conn.send(("expired", str(e)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    except (EOFError, OSError):
+        pass
+    finally:
+        if segment is not None:
+            segment.close()
+        conn.close()
+
+
+def _accept_loop(listener, batchers: dict, state: dict):
+    while True:
+        conn = listener.accept()
+        threading.Thread(
+            target=_serve_connection, args=(conn, batchers, state), daemon=True
+        ).start()
+
+
+def serve(address: str, intra_op_threads: int = 0):
+    """Load and warm the models, then answer requests on address forever"""
+    state = {"models_loaded": False, "warmed": False}
+    if os.path.exists(address):
+        os.remove(address)  # stale socket from a previous run
+    listener = Listener(address, authkey=INFERENCE_AUTHKEY)
+    max_wait = INFERENCE_BATCH_WAIT_MS / 1000
+    batchers = {
+        "classify": _Batcher(inference.classify, max_wait),
+        "extract": _Batcher(inference.extract_features, max_wait),
+    }
+    # Accept straight away so clients can poll "status" while we load
+    accept_thread = threading.Thread(
+        target=_accept_loop, args=(listener, batchers, state), daemon=True
+    )
+    accept_thread.start()
+    print(f"Inference server listening on {address}")
+
+    tf, _ = inference.import_backend()
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    inference.activate(inference.load_models())
+    state["models_loaded"] = True
+    for size in BATCH_BUCKETS:
+        inference.warm_up_bucket(size)
+    state["warmed"] = True
+    model_reload.start_watcher()
+    print("✅ Inference server ready")
+    accept_thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the snake inference server")
+    parser.add_argument("--address", action="append", required=True,
+                        help="Socket path to listen on; repeat to start a pool of servers")
+    parser.add_argument("--intra-op-threads", type=int, default=0,
+                        help="TensorFlow intra-op threads per server (0 = TensorFlow default)")
+    args = parser.parse_args()
+
+    if len(args.address) == 1:
+        serve(args.address[0], args.intra_op_threads)
+    else:
+        processes = [
+            multiprocessing.Process(target=serve, args=(address, args.intra_op_threads))
+            for address in args.address
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
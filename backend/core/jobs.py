@@ -0,0 +1,328 @@
+"""
+Background jobs, backed by the jobs table.
+
+An endpoint calls enqueue(db, kind, payload) before it commits, so the job
+row is committed together with the change it belongs to and is never lost.
+JOB_WORKERS threads per process claim queued jobs (a conditional UPDATE, so
+several uvicorn workers can share the table), run the handler registered for
+the kind, and record progress, retries and failures on the row.
+
+A failing job is retried up to max_attempts times with exponential backoff
+(JOB_RETRY_BACKOFF_S, doubling). Raise Permanent for failures a retry can't
+fix. A job whose worker died mid-run (no heartbeat for JOB_STALE_S) is
+queued again. Admins see the table through GET /admin/jobs.
+"""
+import io
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from PIL import Image
+from sqlalchemy import event, update
+from sqlalchemy.orm import load_only
+
+from core import catalog_snapshot, embeddings, inference, metrics, model_reload
+from core.config import JOB_WORKERS, JOB_POLL_S, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF_S, JOB_STALE_S, JOB_KEEP_DAYS
+from models import models
+from models.database import SessionLocal
+
+STATUSES = ("queued", "running", "succeeded", "failed")
+
+metrics.counter("jobs_total", "Finished job attempts, by kind and outcome")
+metrics.histogram("job_duration_seconds", "Time to run one job attempt", buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300))
+
+HANDLERS = {}
+
+_wake = threading.Event()
+_workers = []
+
+
+class Permanent(Exception):
+    """A job failure that retrying won't fix"""
+
+
+def handler(kind: str):
+    """Register fn(job) as the handler for jobs of this kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> models.Job:
+    """Add a job to db's transaction; it runs once the caller commits.
+    Flushes, so the returned job already has its jobid."""
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler for {kind!r}")
+    job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        progress=0.0,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    db.flush()
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_workers(session):
+    # New jobs in this process start straight away instead of at the next poll
+    if session.info.pop("jobs_enqueued", False):
+        _wake.set()
+
+
+def to_dict(job: models.Job) -> dict:
+    return {
+        "jobid": job.jobid,
+        "kind": job.kind,
+        "payload": json.loads(job.payload),
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error,
+        "worker": job.worker,
+        "run_after": job.run_after,
+        "createddate": job.createddate,
+        "updateddate": job.updateddate,
+    }
+
+
+# ------------------------
+# Running jobs
+# ------------------------
+class RunningJob:
+    """What a handler gets: the payload, and a way to report progress"""
+
+    def __init__(self, jobid: int, kind: str, payload: dict, attempt: int):
+        self.jobid = jobid
+        self.kind = kind
+        self.payload = payload
+        self.attempt = attempt
+
+    def progress(self, fraction: float, message: str = None):
+        """Record progress; also the heartbeat that keeps the job claimed"""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(models.Job)
+                .where(models.Job.jobid == self.jobid)
+                .values(progress=min(max(fraction, 0.0), 1.0), message=(message or "")[:255] or None,
+                        updateddate=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+def _claim(db, worker: str):
+    """Atomically take the oldest due queued job, or return None"""
+    now = datetime.utcnow()
+    candidates = (
+        db.query(models.Job.jobid)
+        .filter(models.Job.status == "queued", models.Job.run_after <= now)
+        .order_by(models.Job.run_after, models.Job.jobid)
+        .limit(5)
+        .all()
+    )
+    for (jobid,) in candidates:
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.jobid == jobid, models.Job.status == "queued")
+            .values(status="running", attempts=models.Job.attempts + 1, worker=worker,
+                    progress=0.0, message=None, updateddate=now)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.get(models.Job, jobid)
+    return None
+
+
+def _finish(jobid: int, **values):
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Job).where(models.Job.jobid == jobid).values(updateddate=datetime.utcnow(), **values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_one(worker: str) -> bool:
+    """Claim and run one job. False when there was nothing to do."""
+    db = SessionLocal()
+    try:
+        job = _claim(db, worker)
+        if job is None:
+            return False
+        running = RunningJob(job.jobid, job.kind, json.loads(job.payload), job.attempts)
+        max_attempts = job.max_attempts
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    try:
+        fn = HANDLERS.get(running.kind)
+        if fn is None:
+            raise Permanent(f"No job handler for {running.kind!r}")
+        fn(running)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        if isinstance(e, Permanent) or running.attempt >= max_attempts:
+            outcome = "failed"
+            _finish(running.jobid, status="failed", error=error)
+            print(f"❌ Job {running.jobid} ({running.kind}) failed: {e}")
+        else:
+            outcome = "retried"
+            delay = JOB_RETRY_BACKOFF_S * 2 ** (running.attempt - 1)
+            _finish(running.jobid, status="queued", error=error,
+                    run_after=datetime.utcnow() + timedelta(seconds=delay))
+            print(f"⚠️ Job {running.jobid} ({running.kind}) attempt {running.attempt} failed, retrying in {delay:g}s: {e}")
+    else:
+        outcome = "succeeded"
+        _finish(running.jobid, status="succeeded", progress=1.0, error=None)
+    metrics.inc("jobs_total", kind=running.kind, outcome=outcome)
+    metrics.observe("job_duration_seconds", time.perf_counter() - started, kind=running.kind)
+    return True
+
+
+def housekeeping():
+    """Requeue jobs whose worker stopped heartbeating; drop old successes"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        stale = db.execute(
+            update(models.Job)
+            .where(models.Job.status == "running", models.Job.updateddate < now - timedelta(seconds=JOB_STALE_S))
+            .values(status="queued", run_after=now, error="Worker stopped while running the job")
+        ).rowcount
+        db.query(models.Job).filter(
+            models.Job.status == "succeeded", models.Job.updateddate < now - timedelta(days=JOB_KEEP_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if stale:
+            print(f"⚠️ Requeued {stale} job(s) left running by a stopped worker")
+    finally:
+        db.close()
+
+
+def _worker_loop(name: str):
+    last_housekeeping = 0.0
+    while True:
+        try:
+            if time.monotonic() - last_housekeeping > JOB_STALE_S / 2:
+                housekeeping()
+                last_housekeeping = time.monotonic()
+            if run_one(name):
+                continue
+        except Exception as e:
+            print(f"❌ Job worker {name}: {e}")
+        _wake.wait(JOB_POLL_S)
+        _wake.clear()
+
+
+def start_workers(count: int = JOB_WORKERS):
+    """Start the worker threads for this process (once)"""
+    if _workers:
+        return
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(count):
+        thread = threading.Thread(target=_worker_loop, args=(f"{host}:{i}",), name=f"job-worker-{i}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+    print(f"✅ {count} job worker(s) started")
+
+
+# ------------------------
+# Job kinds
+# ------------------------
+@handler("snake_changed")
+def snake_changed(job: RunningJob):
+    """After a catalog write: republish the /snake/all snapshot and, when
+    the image changed, check it decodes and add it to the similarity index.
+    Payload: {"snakeid": int, "image": bool}"""
+    catalog_snapshot.catalog_changed()
+    if not job.payload.get("image"):
+        return
+    job.progress(0.3, "Catalog snapshot rebuilt")
+
+    snake_id = job.payload["snakeid"]
+    db = SessionLocal()
+    try:
+        snake = (
+            db.query(models.Snake)
+            .options(load_only(models.Snake.snakeimage))
+            .filter(models.Snake.snakeid == snake_id)
+            .first()
+        )
+        image_content = snake.snakeimage if snake is not None else None
+    finally:
+        db.close()
+    if not image_content:
+        # Deleted (or image removed) since the job was queued
+        return
+
+    try:
+        with Image.open(io.BytesIO(image_content)) as img:
+            img.verify()
+    except Exception as e:
+        raise Permanent(f"Snake {snake_id} image is not a readable image: {e}")
+    job.progress(0.5, "Image validated")
+
+    if not inference.models_ready():
+        raise RuntimeError("Models not loaded yet")
+    # Raises (and so retries) while the index is being rebuilt for a model
+    # this worker hasn't loaded yet, or that it has and the index hasn't
+    embeddings.index.add([snake_id], embeddings.embed_images([image_content]),
+                         model_version=inference.current_version())
+
+
+@handler("reembed_catalog")
+def reembed_catalog(job: RunningJob):
+    """After a model reload: embed every catalog image with the new model and
+    replace the similarity index. Payload: {"model_version": str}"""
+    version = job.payload["model_version"]
+    if embeddings.index.built_with() == version:
+        return  # another worker's job got there first
+    if inference.current_version() != version:
+        raise RuntimeError(f"This worker serves model {inference.current_version()}, not {version}")
+    snake_ids, vectors = embeddings.embed_catalog(progress=lambda done: job.progress(0.0, f"Embedded {done} images"))
+    job.progress(0.9, f"Writing {len(snake_ids)} vectors")
+    embeddings.index.rebuild(snake_ids, vectors, model_version=version)
+
+
+def request_reembed(version: str) -> int:
+    """Queue a reembed_catalog job for version unless one is already waiting.
+    Returns its jobid."""
+    payload = json.dumps({"model_version": version})
+    db = SessionLocal()
+    try:
+        pending = (
+            db.query(models.Job.jobid)
+            .filter(models.Job.kind == "reembed_catalog", models.Job.payload == payload,
+                    models.Job.status.in_(("queued", "running")))
+            .first()
+        )
+        if pending is not None:
+            return pending.jobid
+        job = enqueue(db, "reembed_catalog", {"model_version": version})
+        db.commit()
+        return job.jobid
+    finally:
+        db.close()
+
+
+def _reembed_after_reload(version: str):
+    model_reload.state["reembed_job"] = request_reembed(version)
+
+
+model_reload.add_activation_listener(_reembed_after_reload)
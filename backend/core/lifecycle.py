@@ -0,0 +1,160 @@
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+
+from core import catalog_snapshot, inference, jobs, migrations, model_reload, prediction_log, query_plans, relation_graph
+from core.config import INFERENCE_SERVER_ADDRESS
+from models.database import engine
+
+# Seconds spent in each start-up step, in the order they ran
+startup_timings = {}
+
+state = {
+    "db_schema": False,
+    "models_loaded": False,
+    "warmed": False,
+    "errors": {},
+}
+_db_workers_lock = threading.Lock()
+
+
+@contextmanager
+def timed(step: str):
+    """Record how long a start-up step took; errors are kept, not raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        state["errors"][step] = str(e)
+        print(f"❌ Startup step '{step}' failed: {e}")
+    finally:
+        startup_timings[step] = time.perf_counter() - start
+
+
+def check_schema(warn: bool = True):
+    """Check the database is at the latest migration. Schema changes are made
+    by `alembic upgrade head` at deploy time, never by the workers."""
+    current, head = migrations.current_revision(), migrations.head_revision()
+    state["db_schema"] = current == head
+    if not state["db_schema"] and warn:
+        print(f"⚠️ Database schema is at revision {current}, expected {head}. Run: alembic upgrade head")
+
+
+def check_query_plans():
+    """Warn about hot queries that scan a whole table (a lost index)"""
+    for name, uses_index, plan in query_plans.check():
+        if not uses_index:
+            print(f"⚠️ Query '{name}' does not use an index: {'; '.join(plan)}")
+
+
+def start_db_workers():
+    """Start the job workers once the schema is at head (they use tables
+    added by migrations), and the prediction log writer once its table
+    exists. Safe to call repeatedly."""
+    with _db_workers_lock:
+        if state["db_schema"]:
+            jobs.start_workers()
+        prediction_log.start_writer()
+
+
+def run_startup():
+    """Load the schema and models, then warm up. Runs off the event loop."""
+    start = time.perf_counter()
+
+    with timed("db_schema"):
+        check_schema()
+    if state["db_schema"]:
+        with timed("query_plans"):
+            check_query_plans()
+    with timed("catalog_snapshot"):
+        # Picks up changes made while no worker was running
+        catalog_snapshot.snapshot.rebuild()
+    with timed("relation_graph"):
+        relation_graph.graph.load()
+    with timed("job_workers"):
+        start_db_workers()
+
+    if INFERENCE_SERVER_ADDRESS:
+        # Models are owned by the inference server; nothing to load here
+        with timed("connect_inference_server"):
+            inference.connect_remote()
+        state["models_loaded"] = inference.remote_status["models_loaded"]
+        state["warmed"] = inference.remote_status["warmed"]
+        startup_timings["background_total"] = time.perf_counter() - start
+        log_startup_breakdown()
+        return
+
+    loaded = {}
+    with timed("import_tensorflow"):
+        inference.import_backend()
+    with timed("load_mobilenet"):
+        loaded["mobilenet"] = inference.load_mobilenet()
+    with timed("load_pca"):
+        loaded["pca"] = inference.load_pca()
+    with timed("load_classifier"):
+        loaded["classifier"] = inference.load_classifier()
+    if len(loaded) == 3:
+        with timed("model_version"):
+            inference.activate(inference.ModelSet(version=inference.model_version(), **loaded))
+    state["models_loaded"] = inference.models_ready()
+
+    if state["models_loaded"]:
+        warm_up()
+        model_reload.start_watcher()
+
+    startup_timings["background_total"] = time.perf_counter() - start
+    log_startup_breakdown()
+
+
+def warm_up():
+    """Trace every batch bucket before the worker reports ready"""
+    for size in inference.BATCH_BUCKETS:
+        with timed(f"warm_up_batch_{size}"):
+            inference.warm_up_bucket(size)
+    state["warmed"] = not any(step.startswith("warm_up") for step in state["errors"])
+
+
+def start_background() -> threading.Thread:
+    thread = threading.Thread(target=run_startup, name="startup", daemon=True)
+    thread.start()
+    return thread
+
+
+def log_startup_breakdown():
+    print("==== Startup time breakdown ====")
+    for step, seconds in startup_timings.items():
+        print(f"  {step:<26} {seconds * 1000:10.1f} ms")
+    if state["errors"]:
+        print(f"  failed steps: {', '.join(state['errors'])}")
+
+
+def db_reachable() -> bool:
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+def readiness() -> dict:
+    if inference.remote is not None:
+        status = inference.refresh_remote_status()
+        state["models_loaded"] = status["models_loaded"]
+        state["warmed"] = status["warmed"]
+    if not state["db_schema"]:
+        # Picks up an `alembic upgrade head` run after this worker started
+        try:
+            check_schema(warn=False)
+            if state["db_schema"]:
+                start_db_workers()
+        except Exception:
+            pass
+    checks = {
+        "db_schema": state["db_schema"],
+        "models_loaded": state["models_loaded"],
+        "warmed": state["warmed"],
+        "db_reachable": db_reachable(),
+    }
+    return {"ready": all(checks.values()), "checks": checks, "model_version": inference.current_version()}
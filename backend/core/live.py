@@ -0,0 +1,153 @@
+"""
+Live-camera identification over a WebSocket (/snake/live).
+
+The client streams camera frames (JPEG/PNG bytes) as binary messages.
+Frames are never queued: a new frame replaces the previous one if that has
+not been picked up yet (it is counted as dropped), and a frame is only
+picked when an inference slot is free. A fast camera or a slow model
+therefore never builds a backlog, and latency stays flat. Each session
+decodes into a single reused (1, 224, 224, 3) buffer.
+
+Text messages are JSON settings, e.g. {"max_fps": 2} to identify at most
+two frames a second (0 = as fast as the model allows). Each result is sent
+as JSON:
+
+    {"frame": 17, "class_index": 1, "confidence": 0.93, "model_version": "3f2a9c1d0b7e",
+     "latency_ms": 84.1, "wait_ms": 3.0, "inference_ms": 80.2,
+     "frames": 17, "dropped": 9}
+
+latency_ms runs from the frame's arrival to its result.
+"""
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+from fastapi import HTTPException, WebSocket
+
+from core import admission, deadlines, inference, metrics, prediction_log
+from core.config import REQUEST_DEADLINE_S
+
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+MAX_FPS_LIMIT = 60
+
+metrics.counter("live_frames_total", "Live-camera frames, by outcome")
+metrics.histogram("live_frame_latency_seconds", "Live-camera frame arrival to result")
+
+
+class LiveSession:
+    def __init__(self, max_fps: float = 0):
+        self.max_fps = min(max(max_fps, 0), MAX_FPS_LIMIT)
+        self.buffer = np.empty((1, *inference.IMAGE_SIZE, 3), dtype=np.float32)
+        self.frames = 0
+        self.dropped = 0
+        self.closed = False
+        self.deadline = None
+        self.new_frame = asyncio.Event()
+        self._lock = threading.Lock()
+        self._latest = None  # (frame number, bytes, arrival time)
+
+    def put(self, content: bytes):
+        with self._lock:
+            self.frames += 1
+            if self._latest is not None:
+                self.dropped += 1
+                metrics.inc("live_frames_total", outcome="dropped")
+            self._latest = (self.frames, content, time.perf_counter())
+        self.new_frame.set()
+
+    def _take(self):
+        with self._lock:
+            latest, self._latest = self._latest, None
+            return latest
+
+    def configure(self, text: str):
+        try:
+            settings = json.loads(text)
+            if "max_fps" in settings:
+                self.max_fps = min(max(float(settings["max_fps"]), 0), MAX_FPS_LIMIT)
+        except (ValueError, TypeError, AttributeError):
+            pass
+
+    def identify_latest(self, deadline=None):
+        """Identify whichever frame is newest right now. Runs in a worker thread."""
+        latest = self._take()
+        if latest is None:
+            return None
+        number, content, arrived = latest
+        started = time.perf_counter()
+        try:
+            inference.decode_image(content, out=self.buffer[0])
+        except Exception:
+            metrics.inc("live_frames_total", outcome="invalid")
+            raise ValueError(f"Frame {number} is not a valid image")
+        models = inference.active
+        preds = inference.classify(self.buffer, deadline, models)
+        version = inference.served_version(models)
+        finished = time.perf_counter()
+        prediction_log.record(content, preds[0], finished - started, version, "live")
+        metrics.inc("live_frames_total", outcome="identified")
+        metrics.observe("live_frame_latency_seconds", finished - arrived)
+        return {
+            "frame": number,
+            "class_index": int(np.argmax(preds, axis=1)[0]),
+            "confidence": float(np.max(preds)),
+            "model_version": version,
+            "latency_ms": round((finished - arrived) * 1000, 1),
+            "wait_ms": round((started - arrived) * 1000, 1),
+            "inference_ms": round((finished - started) * 1000, 1),
+            "frames": self.frames,
+            "dropped": self.dropped,
+        }
+
+    async def receive(self, websocket: WebSocket):
+        """Read frames and settings until the client goes away"""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    if len(message["bytes"]) > MAX_FRAME_BYTES:
+                        metrics.inc("live_frames_total", outcome="too_large")
+                        continue
+                    self.put(message["bytes"])
+                elif message.get("text") is not None:
+                    self.configure(message["text"])
+        finally:
+            self.closed = True
+            if self.deadline is not None:
+                self.deadline.cancel("disconnected")
+            self.new_frame.set()
+
+    async def process(self, websocket: WebSocket):
+        """Identify the newest frame whenever the model (and max_fps) allow"""
+        next_allowed = 0.0
+        while True:
+            await self.new_frame.wait()
+            if self.closed:
+                return
+            delay = next_allowed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self.closed:
+                    return
+            self.new_frame.clear()
+            started = time.perf_counter()
+            self.deadline = deadlines.Deadline(REQUEST_DEADLINE_S)
+            try:
+                result = await admission.identification.run(self.identify_latest, deadline=self.deadline)
+            except deadlines.Cancelled:
+                if self.closed:
+                    return
+                continue
+            except HTTPException as e:
+                result = {"error": e.detail, "retry_after": (e.headers or {}).get("Retry-After")}
+            except Exception as e:
+                result = {"error": str(e)}
+            if result is None:
+                continue
+            if self.max_fps:
+                next_allowed = started + 1 / self.max_fps
+            await websocket.send_json(result)
@@ -0,0 +1,88 @@
+"""
+Process-local metrics in the Prometheus text format, served at /metrics.
+
+No client library needed: counters, gauges and histograms are kept in plain
+dicts keyed by (name, labels). Each uvicorn worker exports its own values;
+scrape every worker or sum them in Prometheus.
+"""
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_types = {}       # name -> (type, help)
+_values = {}      # (name, labels) -> float, for counters and gauges
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_buckets = {}     # name -> bucket bounds
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def counter(name: str, help: str):
+    _types[name] = ("counter", help)
+
+
+def gauge(name: str, help: str):
+    _types[name] = ("gauge", help)
+
+
+def histogram(name: str, help: str, buckets=DEFAULT_BUCKETS):
+    _types[name] = ("histogram", help)
+    _buckets[name] = tuple(buckets)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    bounds = _buckets[name]
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [0] * (len(bounds) + 2)
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                entry[i] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for name, (kind, help) in _types.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for (key_name, labels), value in _values.items():
+                    if key_name == name:
+                        lines.append(f"{name}{_labels(labels)} {value:g}")
+                continue
+            bounds = _buckets[name]
+            for (key_name, labels), entry in _histograms.items():
+                if key_name != name:
+                    continue
+                for bound, count in zip(bounds, entry):
+                    lines.append(f"{name}_bucket{_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {entry[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {entry[-2]:g}")
+                lines.append(f"{name}_count{_labels(labels)} {entry[-1]}")
+    return "\n".join(lines) + "\n"
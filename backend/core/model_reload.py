@@ -0,0 +1,258 @@
+"""
+Hot model reload.
+
+Replace the model files (MOBILENET_PATH, PCA_PATH, CLASSIFIER_PATH) while the
+service is running and every worker picks them up without a restart:
+
+  1. the new files are loaded into a second ModelSet next to the active one
+     (so memory briefly holds both),
+  2. every batch bucket is warmed on the new set,
+  3. the new set is validated: its output for the warm-up batch must be
+     finite and shaped like the active set's, and on the holdout images in
+     MODEL_HOLDOUT_DIR (<class_index>/<image>, if any) its accuracy must
+     reach MODEL_RELOAD_MIN_ACCURACY and not fall more than
+     MODEL_RELOAD_MAX_REGRESSION below the active set's,
+  4. inference.activate() swaps it in with a single assignment.
+
+Requests that started on the old set finish on it. If any step fails the old
+set stays active and the reason is kept in status().
+
+The similarity index (core/embeddings.py) holds vectors from the model that
+built it. After an activation, status() reports embeddings_stale and
+/snake/similar answers 503 until the index is rebuilt with the new model,
+which the reembed_catalog job (core/jobs.py) does.
+
+A reload starts when the model files change (each worker polls them every
+MODEL_WATCH_INTERVAL_S seconds and waits until they stop changing) or when
+MODEL_RELOAD_TRIGGER is touched, which is what POST /admin/models/reload
+does so that every worker follows, not just the one that took the request.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from core import embeddings, inference, metrics
+from core.config import (
+    MOBILENET_PATH, PCA_PATH, CLASSIFIER_PATH, BATCH_BUCKETS,
+    MODEL_WATCH_INTERVAL_S, MODEL_RELOAD_TRIGGER, MODEL_HOLDOUT_DIR, MODEL_HOLDOUT_PER_CLASS,
+    MODEL_RELOAD_MIN_ACCURACY, MODEL_RELOAD_MAX_REGRESSION,
+)
+
+WATCHED_FILES = (MOBILENET_PATH, PCA_PATH, CLASSIFIER_PATH, MODEL_RELOAD_TRIGGER)
+
+metrics.gauge("model_info", "Active model version (value is always 1)")
+metrics.counter("model_reloads_total", "Model reload attempts, by outcome")
+
+state = {
+    "status": "idle",  # idle, running, activated, unchanged, rejected, failed
+    "trigger": None,
+    "started_at": None,
+    "finished_at": None,
+    "from_version": None,
+    "to_version": None,
+    "validation": None,
+    "error": None,
+    "embeddings_stale": False,
+    "reembed_job": None,
+}
+
+_lock = threading.Lock()
+_stamp = None  # file stamps the last reload (or start-up) saw
+_watcher = None
+_activation_listeners = []  # fn(version) after a new set is activated
+
+
+class Rejected(Exception):
+    """The new model set failed validation"""
+
+
+def status() -> dict:
+    embeddings_stale()
+    return dict(state, active_version=inference.current_version())
+
+
+def add_activation_listener(listener):
+    _activation_listeners.append(listener)
+
+
+def embeddings_stale() -> bool:
+    """True while the similarity index holds another model's vectors"""
+    built = embeddings.index.built_with()
+    if built is not None:
+        state["embeddings_stale"] = built != inference.current_version()
+    # An index from before model versions were recorded is stale only
+    # after a reload in this worker
+    return state["embeddings_stale"]
+
+
+def file_stamp() -> tuple:
+    stamps = []
+    for path in WATCHED_FILES:
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def _export_version(old, new):
+    if old is not None:
+        metrics.set_gauge("model_info", 0, version=old)
+    metrics.set_gauge("model_info", 1, version=new)
+
+
+# ------------------------
+# Validation
+# ------------------------
+def load_holdout():
+    """(images, labels) from MODEL_HOLDOUT_DIR, or None when there are none"""
+    if not MODEL_HOLDOUT_DIR or not os.path.isdir(MODEL_HOLDOUT_DIR):
+        return None
+    images, labels = [], []
+    for label in sorted(os.listdir(MODEL_HOLDOUT_DIR)):
+        class_dir = os.path.join(MODEL_HOLDOUT_DIR, label)
+        if not label.isdigit() or not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir))[:MODEL_HOLDOUT_PER_CLASS]:
+            try:
+                with open(os.path.join(class_dir, name), "rb") as f:
+                    images.append(inference.decode_image(f.read()))
+            except Exception:
+                continue
+            labels.append(int(label))
+    if not images:
+        return None
+    return np.stack(images), np.array(labels)
+
+
+def accuracy(models, holdout) -> float:
+    images, labels = holdout
+    preds = inference.classify(images, models=models)
+    return float(np.mean(np.argmax(preds, axis=1) == labels))
+
+
+def validate(candidate, current) -> dict:
+    """Raise Rejected unless candidate may replace current (which may be None)"""
+    probe = np.zeros((BATCH_BUCKETS[0], *inference.IMAGE_SIZE, 3), dtype=np.float32)
+    output = inference.classify(probe, models=candidate)
+    if not np.all(np.isfinite(output)):
+        raise Rejected("model output contains NaN or infinity")
+    if current is not None:
+        expected = inference.classify(probe, models=current).shape
+        if output.shape != expected:
+            raise Rejected(f"output shape {output.shape} does not match the active model's {expected}")
+    result = {"output_shape": list(output.shape)}
+
+    holdout = load_holdout()
+    if holdout is None:
+        return result
+    result["holdout_images"] = len(holdout[1])
+    result["accuracy"] = accuracy(candidate, holdout)
+    if result["accuracy"] < MODEL_RELOAD_MIN_ACCURACY:
+        raise Rejected(f"holdout accuracy {result['accuracy']:.3f} is below {MODEL_RELOAD_MIN_ACCURACY:.3f}")
+    if current is not None:
+        result["active_accuracy"] = accuracy(current, holdout)
+        if result["accuracy"] < result["active_accuracy"] - MODEL_RELOAD_MAX_REGRESSION:
+            raise Rejected(
+                f"holdout accuracy {result['accuracy']:.3f} regresses from {result['active_accuracy']:.3f}"
+            )
+    return result
+
+
+# ------------------------
+# Reload
+# ------------------------
+def _reload(trigger: str):
+    """Load, warm, validate and activate the model files. Caller holds _lock."""
+    global _stamp
+    try:
+        _stamp = file_stamp()
+        current = inference.active
+        state.update(
+            status="running", trigger=trigger, started_at=time.time(), finished_at=None,
+            from_version=current.version if current else None, to_version=None, validation=None, error=None,
+        )
+        try:
+            version = inference.model_version()
+            state["to_version"] = version
+            if current is not None and version == current.version:
+                state["status"] = "unchanged"
+            else:
+                candidate = inference.load_models()
+                for size in BATCH_BUCKETS:
+                    inference.warm_up_bucket(size, models=candidate)
+                state["validation"] = validate(candidate, current)
+                inference.activate(candidate)
+                _export_version(state["from_version"], version)
+                state.update(status="activated", embeddings_stale=True, reembed_job=None)
+                for listener in _activation_listeners:
+                    try:
+                        listener(version)
+                    except Exception as e:
+                        print(f"⚠️ After activating model {version}: {e}")
+        except Rejected as e:
+            state.update(status="rejected", error=str(e))
+            print(f"⚠️ Model version {state['to_version']} rejected: {e}")
+        except Exception as e:
+            state.update(status="failed", error=str(e))
+            print(f"❌ Model reload failed: {e}")
+        state["finished_at"] = time.time()
+        metrics.inc("model_reloads_total", outcome=state["status"])
+    finally:
+        _lock.release()
+
+
+def reload(trigger: str) -> dict:
+    """Reload now and return status(). Only one reload runs at a time; if one
+    is already running this returns straight away with its status."""
+    if _lock.acquire(blocking=False):
+        _reload(trigger)
+    return status()
+
+
+def request_reload(trigger: str) -> bool:
+    """Start a reload in the background; False if one is already running"""
+    if not _lock.acquire(blocking=False):
+        return False
+    state.update(status="running", trigger=trigger)
+    threading.Thread(target=_reload, args=(trigger,), name="model-reload", daemon=True).start()
+    return True
+
+
+def touch_trigger():
+    """Tell every worker watching MODEL_RELOAD_TRIGGER to reload"""
+    directory = os.path.dirname(MODEL_RELOAD_TRIGGER)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(MODEL_RELOAD_TRIGGER, "a"):
+        pass
+    os.utime(MODEL_RELOAD_TRIGGER)
+
+
+def _watch(interval: float):
+    pending = None
+    while True:
+        time.sleep(interval)
+        stamp = file_stamp()
+        if stamp == _stamp:
+            pending = None
+        elif stamp != pending:
+            pending = stamp  # still being written? look again next time
+        else:
+            pending = None
+            reload("file_change")
+
+
+def start_watcher(interval: float = MODEL_WATCH_INTERVAL_S):
+    """Record the files the active set came from and poll them for changes"""
+    global _stamp, _watcher
+    _stamp = file_stamp()
+    if inference.active is not None:
+        _export_version(None, inference.active.version)
+    if interval <= 0 or _watcher is not None:
+        return
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="model-watcher", daemon=True)
+    _watcher.start()
@@ -0,0 +1,199 @@
+"""
+Typeahead search over snake names, English and Sinhala.
+
+    /snake/search?q=russ          prefix match on any word of either name
+    /snake/search?q=rusel&lang=en  typo-tolerant (fuzzy) match
+    /snake/search?q=තිත්
+
+Names are normalised before indexing and querying (zero-width joiners
+dropped so Sinhala conjuncts typed with or without ZWJ match, NFKD, Latin
+combining accents U+0300-U+036F removed, NFC, case folding) and split into
+words. Words are kept in a sorted list, so a prefix lookup is a binary
+search, and in a character trigram index used to find candidates for fuzzy
+matching, which are then checked with an edit distance against the word's
+prefix.
+
+The index is built from the relation graph's copy of the catalog names
+(core/relation_graph.py) and updated with it, word by word, whenever a
+snake is added, renamed or deleted; no query touches the database.
+"""
+import bisect
+import re
+import unicodedata
+
+from core import relation_graph
+
+NAME_FIELDS = {"en": "snakeenglishname", "si": "snakesinhalaname"}
+MAX_LIMIT = 50
+# Prefix and fuzzy matches rank after exact ones
+EXACT, PREFIX, FUZZY = 0, 1, 2
+
+# Zero-width joiner/non-joiner and zero-width space: in Sinhala, ZWJ only
+# changes how a conjunct is drawn, and keyboards differ on inserting it
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+_SEPARATOR = re.compile(r"[^\w\u0d80-\u0dff]+")  # Sinhala vowel signs are not \w
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.translate(_INVISIBLE))
+    # Drop Latin combining accents (é -> e); Sinhala vowel signs are kept
+    text = "".join(char for char in text if not "\u0300" <= char <= "\u036f")
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+def words(text: str):
+    return [word for word in _SEPARATOR.split(normalize(text)) if word]
+
+
+def trigrams(word: str):
+    # Leading padding only: queries are prefixes, their ends are open
+    padded = "^" + word
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def max_typos(word: str) -> int:
+    # Too little to go on in one to three letters
+    return 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+
+
+def prefix_distance(query: str, word: str, limit: int) -> int:
+    """Smallest edit distance between query and a prefix of word, or
+    limit + 1 when it is more than limit. Only the diagonal band that can
+    stay within limit is computed."""
+    word = word[:len(query) + limit]
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(word) + 1)]
+    for i, char in enumerate(query, 1):
+        current = [over] * (len(word) + 1)
+        current[0] = best = i if i <= limit else over
+        for j in range(max(1, i - limit), min(len(word), i + limit) + 1):
+            cost = previous[j - 1] + (char != word[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return min(min(previous), over)
+
+
+class NameIndex:
+    def __init__(self):
+        self.entries = []   # sorted (word, snakeid, field)
+        self.grams = {}     # trigram -> {word: entries using it}
+        self.indexed = {}   # snakeid -> [(word, field), ...]
+
+    # ------------------------
+    # Maintenance (called by the relation graph, under its lock)
+    # ------------------------
+    def on_node_changed(self, graph, snakeid):
+        if snakeid is None:
+            self.entries, self.grams, self.indexed = [], {}, {}
+            for node_id, node in graph.nodes.items():
+                self._add(node_id, node, sort=False)
+            self.entries.sort()
+            return
+        self._remove(snakeid)
+        if snakeid in graph.nodes:
+            self._add(snakeid, graph.nodes[snakeid])
+
+    def _add(self, snakeid: int, node: dict, sort: bool = True):
+        indexed = []
+        for field in NAME_FIELDS.values():
+            for word in set(words(node.get(field) or "")):
+                if sort:
+                    bisect.insort(self.entries, (word, snakeid, field))
+                else:
+                    self.entries.append((word, snakeid, field))
+                for gram in trigrams(word):
+                    users = self.grams.setdefault(gram, {})
+                    users[word] = users.get(word, 0) + 1
+                indexed.append((word, field))
+        self.indexed[snakeid] = indexed
+
+    def _remove(self, snakeid: int):
+        for word, field in self.indexed.pop(snakeid, ()):
+            position = bisect.bisect_left(self.entries, (word, snakeid, field))
+            if position < len(self.entries) and self.entries[position] == (word, snakeid, field):
+                del self.entries[position]
+            for gram in trigrams(word):
+                users = self.grams.get(gram, {})
+                users[word] = users.get(word, 1) - 1
+                if users[word] <= 0:
+                    users.pop(word, None)
+                if not users:
+                    self.grams.pop(gram, None)
+
+    # ------------------------
+    # Queries
+    # ------------------------
+    def _prefix_matches(self, query_word: str, fields, found: dict):
+        position = bisect.bisect_left(self.entries, (query_word,))
+        while position < len(self.entries) and self.entries[position][0].startswith(query_word):
+            word, snakeid, field = self.entries[position]
+            if field in fields:
+                rank = EXACT if word == query_word else PREFIX
+                found[snakeid] = min(found.get(snakeid, FUZZY), rank)
+            position += 1
+
+    def _fuzzy_matches(self, query_word: str, fields, found: dict):
+        typos = max_typos(query_word)
+        if not typos:
+            return
+        grams = trigrams(query_word)
+        shared = {}
+        for gram in grams:
+            for word in self.grams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        # One edit changes at most three trigrams
+        needed = len(grams) - 3 * typos
+        for word, count in shared.items():
+            if count < needed or word.startswith(query_word):
+                continue
+            if prefix_distance(query_word, word, typos) > typos:
+                continue
+            position = bisect.bisect_left(self.entries, (word,))
+            while position < len(self.entries) and self.entries[position][0] == word:
+                _, snakeid, field = self.entries[position]
+                if field in fields:
+                    found.setdefault(snakeid, FUZZY)
+                position += 1
+
+    def search(self, query: str, fields, limit: int, fuzzy: bool = True):
+        """[(snakeid, rank)] for snakes whose names match every query word,
+        best first. The last word may be a prefix; the others too, since
+        typeahead users abbreviate."""
+        query_words = words(query)
+        if not query_words:
+            return []
+        matched = None
+        for query_word in query_words:
+            found = {}
+            self._prefix_matches(query_word, fields, found)
+            if fuzzy and len(found) < limit:
+                self._fuzzy_matches(query_word, fields, found)
+            if matched is None:
+                matched = found
+            else:
+                matched = {snakeid: max(rank, found[snakeid]) for snakeid, rank in matched.items() if snakeid in found}
+            if not matched:
+                return []
+        return sorted(matched.items(), key=lambda item: (item[1], item[0]))[:limit]
+
+
+index = NameIndex()
+relation_graph.graph.add_node_listener(index.on_node_changed)
+
+
+def search(query: str, languages, limit: int = 10, fuzzy: bool = True):
+    """Matching snakes as response dicts, with how they matched"""
+    fields = {NAME_FIELDS[code] for code in languages}
+    with relation_graph.graph.reading() as graph:
+        return [
+            graph.node(snakeid, match=("exact", "prefix", "fuzzy")[rank])
+            for snakeid, rank in index.search(query, fields, max(1, min(limit, MAX_LIMIT)), fuzzy)
+        ]
@@ -0,0 +1,143 @@
+"""
+Durable log of production predictions, in the predictions table.
+
+record() only appends to an in-memory buffer, so identification never waits
+for the database. A writer thread per worker flushes the buffer with
+multi-row inserts of up to PREDICTION_LOG_BATCH rows, as soon as a batch is
+full and otherwise every PREDICTION_LOG_FLUSH_S seconds.
+
+Memory is bounded: when PREDICTION_LOG_MAX_BUFFER rows are waiting (the
+database is slow or down), new predictions are dropped and counted in
+prediction_log_dropped_total instead of queueing without limit. Rows from a
+failed insert go back in the buffer while there is room.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from core import metrics
+from core.config import PREDICTION_LOG, PREDICTION_LOG_BATCH, PREDICTION_LOG_FLUSH_S, PREDICTION_LOG_MAX_BUFFER
+
+metrics.counter("prediction_log_written_total", "Predictions written to the predictions table")
+metrics.counter("prediction_log_dropped_total", "Predictions not logged, by reason")
+metrics.gauge("prediction_log_buffer", "Predictions waiting to be written")
+metrics.histogram("prediction_log_flush_seconds", "Time to write one batch of predictions")
+
+_buffer = deque()
+_lock = threading.Lock()
+_full = threading.Event()
+_writer = None
+
+
+def hash_image(image) -> str:
+    """sha256 of image bytes, or of a uint8 array's pixels (hashed in place
+    when the array is contiguous, as rows of a decoded batch are)"""
+    if isinstance(image, np.ndarray) and not image.flags.c_contiguous:
+        image = np.ascontiguousarray(image)
+    return hashlib.sha256(image).hexdigest()
+
+
+def record(image, probabilities, latency_s: float, model_version: str, source: str):
+    """Queue one prediction (image: the bytes or pixels that were classified,
+    hashed only when the prediction is kept; probabilities: one row of the
+    model output)"""
+    if not PREDICTION_LOG:
+        return
+    if _writer is None:
+        metrics.inc("prediction_log_dropped_total", reason="no_writer")
+        return
+    row = {
+        "createddate": datetime.utcnow(),
+        "image_hash": hash_image(image),
+        "class_index": int(probabilities.argmax()),
+        "confidence": float(probabilities.max()),
+        "probabilities": json.dumps([round(float(p), 6) for p in probabilities]),
+        "latency_ms": round(latency_s * 1000, 2),
+        "model_version": model_version,
+        "source": source,
+    }
+    with _lock:
+        if len(_buffer) >= PREDICTION_LOG_MAX_BUFFER:
+            metrics.inc("prediction_log_dropped_total", reason="buffer_full")
+            return
+        _buffer.append(row)
+        size = len(_buffer)
+        metrics.set_gauge("prediction_log_buffer", size)
+    if size >= PREDICTION_LOG_BATCH:
+        _full.set()
+
+
+def _take(limit: int):
+    with _lock:
+        rows = [_buffer.popleft() for _ in range(min(limit, len(_buffer)))]
+        metrics.set_gauge("prediction_log_buffer", len(_buffer))
+    return rows
+
+
+def _put_back(rows):
+    with _lock:
+        room = max(0, PREDICTION_LOG_MAX_BUFFER - len(_buffer))
+        kept = rows[:room]
+        _buffer.extendleft(reversed(kept))
+    if len(rows) > len(kept):
+        metrics.inc("prediction_log_dropped_total", len(rows) - len(kept), reason="write_failed")
+
+
+def flush() -> int:
+    """Write everything buffered now. Returns the number of rows written."""
+    # Imported here: the inference server imports this module through
+    # core/inference.py but never logs, and has no database
+    from models import models
+    from models.database import engine
+
+    written = 0
+    while True:
+        rows = _take(PREDICTION_LOG_BATCH)
+        if not rows:
+            return written
+        started = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                connection.execute(models.Prediction.__table__.insert(), rows)
+        except Exception as e:
+            _put_back(rows)
+            print(f"⚠️ Could not write {len(rows)} predictions: {e}")
+            return written
+        metrics.observe("prediction_log_flush_seconds", time.perf_counter() - started)
+        metrics.inc("prediction_log_written_total", len(rows))
+        written += len(rows)
+
+
+def _run():
+    while True:
+        _full.wait(PREDICTION_LOG_FLUSH_S)
+        _full.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"❌ Prediction log writer: {e}")
+
+
+def table_exists() -> bool:
+    from sqlalchemy import inspect
+    from models import models
+    from models.database import engine
+
+    return inspect(engine).has_table(models.Prediction.__tablename__)
+
+
+def start_writer():
+    """Start this worker's writer thread (once), if the predictions table exists"""
+    global _writer
+    if not PREDICTION_LOG or _writer is not None:
+        return
+    if not table_exists():
+        print("⚠️ No predictions table; predictions will not be logged. Run: alembic upgrade head")
+        return
+    _writer = threading.Thread(target=_run, name="prediction-log", daemon=True)
+    _writer.start()
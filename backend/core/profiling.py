@@ -0,0 +1,282 @@
+"""
+On-demand request profiling for admins.
+
+A request is profiled when an admin sends it with an X-Profile header
+("1", or "tf" to add a TensorFlow profiler trace), or when it is picked by
+the sampling rate set through PUT /debug/profiling. When neither applies the
+middleware only checks one header and one float, and nothing else runs.
+
+A profiled request records:
+  - a cProfile profile of its identification work (the admission-controlled
+    call in the worker thread: PIL decode, Keras predict, PCA, ...),
+  - every SQL statement it ran, with its duration,
+  - the wall-clock time of the whole request,
+  - optionally a TensorFlow trace (local models only; open with TensorBoard).
+
+Only one request is profiled at a time; others pass through untouched. The
+last PROFILE_KEEP profiles are kept in PROFILE_DIR for download from
+/debug/profiles/{id}: .prof (pstats, e.g. for snakeviz), .txt (top
+functions) and -tf.zip (the trace).
+"""
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+from sqlalchemy import event
+from starlette.datastructures import Headers
+
+from core.config import ALGORITHM, PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE_RATE, SECRET_KEY
+from models import models
+from models.database import SessionLocal, engine, replica_engines
+
+TOP_FUNCTIONS = 40
+
+settings = {
+    "sample_rate": PROFILE_SAMPLE_RATE,  # fraction of requests profiled without a header
+    "tf_trace": False,                   # add a TensorFlow trace to sampled requests
+}
+
+current = contextvars.ContextVar("profile", default=None)
+_busy = threading.Lock()
+
+
+class Profile:
+    def __init__(self, method: str, path: str, trigger: str, tf_trace: bool):
+        self.id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.tf_trace = tf_trace
+        self.started = time.time()
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.status = None
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn under this request's cProfile profiler"""
+        self.profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+
+    def summary(self, duration: float) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": round(duration * 1000, 1),
+            "db_ms": round(sum(ms for _, ms in self.queries), 1),
+            "db_queries": len(self.queries),
+            "tf_trace": self.tf_trace,
+        }
+
+
+def profiled(fn):
+    """fn, wrapped to run under the current request's profiler if it has one.
+    Used by the admission queue around the model call."""
+    profile = current.get()
+    if profile is None:
+        return fn
+    return lambda *args, **kwargs: profile.run(fn, *args, **kwargs)
+
+
+# ------------------------
+# SQL timing (listeners exist only while a request is being profiled)
+# ------------------------
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if current.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.queries.append((statement, (time.perf_counter() - started) * 1000))
+
+
+def _listen(enabled: bool):
+    # Reads may be routed to a replica (get_read_db), so time those too
+    for target in (engine, *replica_engines):
+        for name, fn in (("before_cursor_execute", _before_execute), ("after_cursor_execute", _after_execute)):
+            if enabled:
+                event.listen(target, name, fn)
+            else:
+                event.remove(target, name, fn)
+
+
+# ------------------------
+# TensorFlow trace
+# ------------------------
+def _tf():
+    """TensorFlow, if it's already loaded in this process"""
+    from core import inference
+    if inference.remote is not None:
+        return None
+    return sys.modules.get("tensorflow")
+
+
+def _trace_dir(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}-tf")
+
+
+# ------------------------
+# Storage
+# ------------------------
+def _path(name: str) -> str:
+    return os.path.join(PROFILE_DIR, name)
+
+
+def save(profile: Profile, duration: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    summary = profile.summary(duration)
+
+    profile.profiler.dump_stats(_path(f"{profile.id}.prof"))
+    report = io.StringIO()
+    report.write(f"{profile.method} {profile.path} -> {profile.status}, {summary['duration_ms']} ms\n\n")
+    report.write(f"SQL: {summary['db_queries']} queries, {summary['db_ms']} ms\n")
+    for statement, ms in sorted(profile.queries, key=lambda query: -query[1])[:10]:
+        report.write(f"  {ms:8.1f} ms  {' '.join(statement.split())[:160]}\n")
+    report.write("\nIdentification work (cProfile, by cumulative time):\n")
+    try:
+        pstats.Stats(profile.profiler, stream=report).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    except TypeError:  # nothing was profiled (no model call in this request)
+        report.write("  (no identification work in this request)\n")
+    with open(_path(f"{profile.id}.txt"), "w") as f:
+        f.write(report.getvalue())
+
+    if profile.tf_trace and os.path.isdir(_trace_dir(profile.id)):
+        shutil.make_archive(_trace_dir(profile.id), "zip", _trace_dir(profile.id))
+        shutil.rmtree(_trace_dir(profile.id), ignore_errors=True)
+    with open(_path(f"{profile.id}.json"), "w") as f:
+        json.dump(summary, f)
+    _prune()
+
+
+def list_profiles() -> list:
+    """Stored profile summaries, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    summaries = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(_path(name)) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return summaries
+
+
+def _prune():
+    for summary in list_profiles()[PROFILE_KEEP:]:
+        for suffix in (".json", ".prof", ".txt", "-tf.zip"):
+            try:
+                os.remove(_path(summary["id"] + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def profile_file(profile_id: str, kind: str):
+    """Path of a stored file (kind: prof, txt or tf), or None"""
+    suffix = {"prof": ".prof", "txt": ".txt", "tf": "-tf.zip"}.get(kind)
+    if suffix is None or os.path.basename(profile_id) != profile_id:
+        return None
+    path = _path(profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+# ------------------------
+# Middleware
+# ------------------------
+def _is_admin(authorization: str) -> bool:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        return bool(user is not None and user.is_admin)
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def _trigger(self, scope):
+        """(trigger, tf_trace) when this request should be profiled, else None"""
+        requested = None
+        for key, value in scope["headers"]:
+            if key == b"x-profile":
+                requested = value.decode("latin-1").strip().lower()
+                break
+        if requested:
+            authorization = Headers(scope=scope).get("authorization", "")
+            if await run_in_threadpool(_is_admin, authorization):
+                return "header", requested == "tf"
+            return None
+        if settings["sample_rate"] and random.random() < settings["sample_rate"]:
+            return "sampled", settings["tf_trace"]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (settings["sample_rate"] or any(
+            key == b"x-profile" for key, _ in scope["headers"]
+        )):
+            await self.app(scope, receive, send)
+            return
+        trigger = await self._trigger(scope)
+        if trigger is None or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], *trigger)
+        tf = _tf() if profile.tf_trace else None
+        profile.tf_trace = tf is not None
+        token = current.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-id", profile.id.encode()))
+            await send(message)
+
+        try:
+            _listen(True)
+            if tf is not None:
+                tf.profiler.experimental.start(_trace_dir(profile.id))
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if tf is not None:
+                tf.profiler.experimental.stop()
+            _listen(False)
+            current.reset(token)
+            duration = time.perf_counter() - started
+            try:
+                await run_in_threadpool(save, profile, duration)
+            except Exception as e:
+                print(f"❌ Could not save profile {profile.id}: {e}")
+            finally:
+                _busy.release()
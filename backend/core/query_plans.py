@@ -0,0 +1,51 @@
+"""
+EXPLAIN the hot per-request lookups and report any that scan a whole table.
+
+Used by check_query_plans.py (the dev/CI check, which fails on a scan) and
+at start-up, which only warns, so a missing index shows up in the log of the
+deployment that lost it.
+"""
+from sqlalchemy import text
+
+from models import models
+from models.database import SessionLocal, engine
+
+
+def hot_queries(db):
+    """The per-request lookups that must be index-backed"""
+    return {
+        "snake by class_label": db.query(models.Snake).filter(models.Snake.class_label == "3"),
+        "snake by id": db.query(models.Snake).filter(models.Snake.snakeid == 1),
+        "related by snakeid": db.query(models.SnakeRelated).filter(models.SnakeRelated.snakeid == 1),
+        "related by relatedsnakeid": db.query(models.SnakeRelated).filter(models.SnakeRelated.relatedsnakeid == 1),
+        "chats by userid": db.query(models.Chat).filter(models.Chat.userid == 1),
+        "user by username": db.query(models.User).filter(models.User.username == "a@b.lk"),
+    }
+
+
+def explain(connection, dialect, sql):
+    """Return (uses_index, plan lines) for one statement"""
+    if dialect == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        details = [row[-1] for row in rows]
+        # SEARCH = index lookup; SCAN = walks the whole table (or index)
+        return all(detail.startswith("SEARCH") for detail in details), details
+
+    rows = connection.execute(text(f"EXPLAIN {sql}")).mappings().fetchall()
+    details = [f"table={row['table']} type={row['type']} key={row['key']}" for row in rows]
+    uses_index = all(row["key"] is not None and row["type"] != "ALL" for row in rows)
+    return uses_index, details
+
+
+def check() -> list:
+    """[(name, uses_index, plan lines)] for every hot query"""
+    db = SessionLocal()
+    try:
+        connection = db.connection()
+        results = []
+        for name, query in hot_queries(db).items():
+            sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            results.append((name, *explain(connection, engine.dialect.name, sql)))
+        return results
+    finally:
+        db.close()
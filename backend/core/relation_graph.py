@@ -0,0 +1,276 @@
+"""
+In-memory index of the snake_related graph.
+
+snake_related is a directed graph (main snake -> related species). This
+module keeps it in memory as forward and reverse adjacency sets, plus each
+snake's names and class_label, so reverse lookups, k-hop neighborhoods and
+connected components are answered without touching the database.
+
+Keeping it in sync:
+  * In this process, a SessionLocal listener records every Snake and
+    SnakeRelated insert, update and delete at flush time and applies them to
+    the index when the transaction commits (and drops them on rollback).
+  * Across workers and scripts, every such commit also rewrites a small
+    generation file (RELATION_GRAPH_STAMP). A worker that sees the file
+    change under it reloads the whole graph (two queries) on the next lookup.
+
+Other in-memory indexes over snake names (core/name_search.py) register in
+add_node_listener() and are kept in step with the graph's copy of the names.
+"""
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import load_only
+
+from core import metrics
+from core.config import RELATION_GRAPH_STAMP
+from models import models
+from models.database import SessionLocal
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+MAX_HOPS = 6
+DIRECTIONS = ("out", "in", "both")
+NODE_FIELDS = ("snakeenglishname", "snakesinhalaname", "class_label")
+
+metrics.counter("relation_graph_loads_total", "Full relation graph loads from the database")
+metrics.gauge("relation_graph_edges", "Relations in this worker's graph index")
+
+
+class RelationGraph:
+    def __init__(self, stamp_path: str):
+        self.stamp_path = stamp_path
+        self._lock = threading.RLock()
+        self._stamp = None
+        self.loaded = False
+        self.forward = {}   # snakeid -> set of related snake ids
+        self.reverse = {}   # snakeid -> set of snake ids it is related species of
+        self.nodes = {}     # snakeid -> {"snakeenglishname", "snakesinhalaname", "class_label"}
+        # fn(graph, snakeid) after a node changes; snakeid None after a full load
+        self.node_listeners = []
+
+    @contextmanager
+    def _file_lock(self):
+        directory = os.path.dirname(self.stamp_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(self.stamp_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self.stamp_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    # ------------------------
+    # Loading and updating
+    # ------------------------
+    def load(self):
+        """Read the whole graph from the database"""
+        with self._lock:
+            stamp = self._read_stamp()
+            db = SessionLocal()
+            try:
+                snakes = db.query(models.Snake).options(
+                    load_only(models.Snake.snakeid, *[getattr(models.Snake, field) for field in NODE_FIELDS])
+                ).all()
+                pairs = db.query(models.SnakeRelated.snakeid, models.SnakeRelated.relatedsnakeid).all()
+            finally:
+                db.close()
+            self.nodes = {snake.snakeid: {field: getattr(snake, field) for field in NODE_FIELDS} for snake in snakes}
+            self.forward, self.reverse = {}, {}
+            for snakeid, relatedsnakeid in pairs:
+                self._add_edge(snakeid, relatedsnakeid)
+            self._stamp = stamp
+            self.loaded = True
+            self._nodes_changed(None)
+            metrics.inc("relation_graph_loads_total")
+            metrics.set_gauge("relation_graph_edges", len(pairs))
+
+    def ensure_current(self):
+        """Reload if never loaded or another process changed the relations"""
+        if not self.loaded or self._read_stamp() != self._stamp:
+            self.load()
+
+    @contextmanager
+    def reading(self):
+        """Hold the graph for a query, reloading it first if it is stale"""
+        with self._lock:
+            self.ensure_current()
+            yield self
+
+    def _add_edge(self, snakeid: int, relatedsnakeid: int):
+        self.forward.setdefault(snakeid, set()).add(relatedsnakeid)
+        self.reverse.setdefault(relatedsnakeid, set()).add(snakeid)
+
+    def _remove_edge(self, snakeid: int, relatedsnakeid: int):
+        self.forward.get(snakeid, set()).discard(relatedsnakeid)
+        self.reverse.get(relatedsnakeid, set()).discard(snakeid)
+
+    def _remove_node(self, snakeid: int):
+        # The database cascades a snake's relations when it is deleted
+        for related in self.forward.pop(snakeid, set()):
+            self.reverse.get(related, set()).discard(snakeid)
+        for parent in self.reverse.pop(snakeid, set()):
+            self.forward.get(parent, set()).discard(snakeid)
+        self.nodes.pop(snakeid, None)
+
+    def add_node_listener(self, listener):
+        with self._lock:
+            self.node_listeners.append(listener)
+            if self.loaded:
+                listener(self, None)
+
+    def _nodes_changed(self, snakeid):
+        for listener in self.node_listeners:
+            listener(self, snakeid)
+
+    def apply(self, changes):
+        """Apply committed changes and bump the generation file so other
+        workers reload. changes: ("edge+"/"edge-", a, b), ("node", id, fields
+        or None when not all were loaded) and ("node-", id)."""
+        with self._lock, self._file_lock():
+            in_sync = self.loaded and self._read_stamp() == self._stamp
+            full_reload = False
+            for change in changes:
+                if change[0] == "edge+":
+                    self._add_edge(change[1], change[2])
+                elif change[0] == "edge-":
+                    self._remove_edge(change[1], change[2])
+                elif change[0] == "node-":
+                    self._remove_node(change[1])
+                    self._nodes_changed(change[1])
+                elif change[2] is None:
+                    full_reload = True
+                else:
+                    self.nodes[change[1]] = change[2]
+                    self._nodes_changed(change[1])
+            try:
+                try:
+                    with open(self.stamp_path) as f:
+                        generation = int(f.read() or 0) + 1
+                except FileNotFoundError:
+                    generation = 1
+                # A new file each time, so the stamp changes even within
+                # one mtime tick
+                with open(self.stamp_path + ".tmp", "w") as f:
+                    f.write(str(generation))
+                os.replace(self.stamp_path + ".tmp", self.stamp_path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not update {self.stamp_path}: {e}")
+                full_reload = True
+            # Only carry on incrementally if nobody else changed the graph
+            # since this worker last read it
+            self._stamp = self._read_stamp() if in_sync and not full_reload else None
+            metrics.set_gauge("relation_graph_edges", sum(len(related) for related in self.forward.values()))
+
+    # ------------------------
+    # Queries (inside reading())
+    # ------------------------
+    def node(self, snakeid: int, **extra) -> dict:
+        return {"snakeid": snakeid, **self.nodes.get(snakeid, dict.fromkeys(NODE_FIELDS)), **extra}
+
+    def related(self, snakeid: int):
+        return sorted(self.forward.get(snakeid, ()))
+
+    def parents(self, snakeid: int):
+        return sorted(self.reverse.get(snakeid, ()))
+
+    def _neighbors(self, snakeid: int, direction: str):
+        if direction in ("out", "both"):
+            yield from self.forward.get(snakeid, ())
+        if direction in ("in", "both"):
+            yield from self.reverse.get(snakeid, ())
+
+    def neighborhood(self, snakeid: int, hops: int, direction: str = "out") -> dict:
+        """snakeid -> hop count for every snake within hops (breadth first)"""
+        distances = {snakeid: 0}
+        queue = deque([snakeid])
+        while queue:
+            current = queue.popleft()
+            if distances[current] == hops:
+                continue
+            for neighbor in self._neighbors(current, direction):
+                if neighbor not in distances:
+                    distances[neighbor] = distances[current] + 1
+                    queue.append(neighbor)
+        return distances
+
+    def component(self, snakeid: int):
+        """Every snake connected to snakeid, ignoring relation direction"""
+        return sorted(self.neighborhood(snakeid, len(self.nodes), "both"))
+
+    def components(self, min_size: int = 2):
+        """Weakly connected components, largest first"""
+        seen, result = set(), []
+        for snakeid in sorted(self.nodes):
+            if snakeid in seen:
+                continue
+            members = self.component(snakeid)
+            seen.update(members)
+            if len(members) >= min_size:
+                result.append(members)
+        result.sort(key=lambda members: (-len(members), members[0]))
+        return result
+
+    def edges(self):
+        return [(snakeid, related) for snakeid in sorted(self.forward) for related in sorted(self.forward[snakeid])]
+
+
+graph = RelationGraph(RELATION_GRAPH_STAMP)
+
+
+# ------------------------
+# Session listeners
+# ------------------------
+def _node_fields(snake):
+    loaded = inspect(snake).dict
+    if not all(field in loaded for field in NODE_FIELDS):
+        return None
+    return {field: loaded[field] for field in NODE_FIELDS}
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_changes(session, flush_context):
+    changes = []
+    for instance in session.new:
+        if isinstance(instance, models.SnakeRelated):
+            changes.append(("edge+", instance.snakeid, instance.relatedsnakeid))
+        elif isinstance(instance, models.Snake):
+            changes.append(("node", instance.snakeid, _node_fields(instance)))
+    for instance in session.dirty:
+        if isinstance(instance, models.Snake):
+            state = inspect(instance)
+            if any(state.attrs[field].history.has_changes() for field in NODE_FIELDS):
+                changes.append(("node", instance.snakeid, _node_fields(instance)))
+    for instance in session.deleted:
+        if isinstance(instance, models.SnakeRelated):
+            changes.append(("edge-", instance.snakeid, instance.relatedsnakeid))
+        elif isinstance(instance, models.Snake):
+            changes.append(("node-", instance.snakeid))
+    if changes:
+        session.info.setdefault("relation_graph_changes", []).extend(changes)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("relation_graph_changes", None)
+    if changes:
+        try:
+            graph.apply(changes)
+        except Exception as e:
+            print(f"❌ Could not update the relation graph index: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("relation_graph_changes", None)
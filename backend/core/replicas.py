@@ -0,0 +1,38 @@
+"""
+Read-your-writes for the read replicas (see models/database.py).
+
+Tracks whether a request wrote through the primary and, if it did, sets the
+db_primary_until cookie so the same client's reads skip the replicas for
+REPLICA_STICKY_S seconds. Does nothing when no replicas are configured.
+"""
+import time
+
+from models.database import ReplicaSessions, STICKY_COOKIE, request_writes
+from core.config import REPLICA_STICKY_S
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ReplicaSessions:
+            await self.app(scope, receive, send)
+            return
+
+        writes = {"wrote": False}
+        token = request_writes.set(writes)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and writes["wrote"]:
+                cookie = (
+                    f"{STICKY_COOKIE}={time.time() + REPLICA_STICKY_S:.3f}; "
+                    f"Max-Age={max(1, int(REPLICA_STICKY_S))}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message.setdefault("headers", []).append((b"set-cookie", cookie.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_writes.reset(token)
@@ -1,6 +1,5 @@
-from models.database import engine
-from models.models import Base
+from core import migrations
 
-print("Creating tables...")
-Base.metadata.create_all(bind=engine)
-print("Done. Tables created.")
+print("Applying migrations...")
+migrations.upgrade()
+print("Done. Database is at revision", migrations.current_revision())
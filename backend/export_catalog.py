@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import zipfile
+import tarfile
+from datetime import datetime
+
+from core import catalog_export
+from models.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the snake catalog (snakes, relations, images) to an archive")
+    parser.add_argument("output", nargs="?", help="Archive path (default: snake-catalog-<timestamp>.zip/.tar.gz)")
+    parser.add_argument("--format", choices=sorted(catalog_export.WRITERS), default="zip")
+    parser.add_argument("--since-id", type=int, help="Only snakes with a larger id")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only snakes added or updated since (ISO time)")
+    args = parser.parse_args()
+
+    output = args.output or catalog_export.filename(args.format)
+    db = SessionLocal()
+    try:
+        with open(output + ".part", "wb") as archive_file:
+            for chunk in catalog_export.iter_export(db, args.format, args.since_id, args.since):
+                archive_file.write(chunk)
+        os.replace(output + ".part", output)
+    finally:
+        db.close()
+
+    if args.format == "zip":
+        with zipfile.ZipFile(output) as archive:
+            meta = json.loads(archive.read("export.json"))
+    else:
+        with tarfile.open(output) as archive:
+            meta = json.load(archive.extractfile("export.json"))
+    print(f"✅ Exported {meta['snakes']} snakes, {meta['images']} images and {meta['relations']} relations to {output}")
+    print(f"   Next incremental export: --since-id {meta['max_snakeid']}"
+          + (f" or --since {meta['latest_updateddate']}" if meta["latest_updateddate"] else ""))
+
+
+if __name__ == "__main__":
+    main()
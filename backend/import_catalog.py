@@ -0,0 +1,44 @@
+import argparse
+import json
+import sys
+
+from core import catalog_import
+from models.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import snakes from an archive of images and a manifest")
+    parser.add_argument("archive", help=".zip or .tar(.gz) with the images (and manifest.csv / manifest.jsonl)")
+    parser.add_argument("--manifest", help="Manifest file, if it is not inside the archive")
+    parser.add_argument("--chunk-size", type=int, default=catalog_import.CHUNK_SIZE, help="Rows per commit")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only; write nothing")
+    parser.add_argument("--report", help="Write the per-row report to this JSONL file")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    manifest_file = open(args.manifest, "rb") if args.manifest else None
+    try:
+        with open(args.archive, "rb") as archive_file:
+            result = catalog_import.import_catalog(
+                db, archive_file, manifest_file, args.manifest or "manifest.csv",
+                chunk_size=args.chunk_size, dry_run=args.dry_run
+            )
+    except catalog_import.CatalogImportError as e:
+        sys.exit(f"Import failed: {e}")
+    finally:
+        if manifest_file:
+            manifest_file.close()
+        db.close()
+
+    for entry in result["rows"]:
+        if entry["status"] == "error":
+            print(f"Row {entry['row']}: {entry['error']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            for entry in result["rows"]:
+                report_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"Done. {json.dumps(result['summary'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,42 @@
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 import os
-from models.database import engine, Base
-from models import models
-from routers import auth, chat, snake, snake_related
+from core import lifecycle, metrics, prediction_log
+from core.compression import CompressionMiddleware
+from core.profiling import ProfilingMiddleware
+from core.replicas import ReadYourWritesMiddleware
+from core.responses import FastJSONResponse
+from routers import admin, auth, chat, snake, snake_related
 from routers import debug  # Import our debug router
 
 # Create static directories if they don't exist
 os.makedirs("static/uploads", exist_ok=True)
 os.makedirs("static/snake_images", exist_ok=True)
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Snake Identification API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema check, model loading and warm-up run in the background so the
+    # worker can answer /health straight away; /ready reports when it's done.
+    lifecycle.startup_timings["import_app"] = time.perf_counter() - _import_started
+    lifecycle.start_background()
+    yield
+    # Don't lose the predictions still waiting to be written
+    await run_in_threadpool(prediction_log.flush)
+
+
+app = FastAPI(
+    title="Snake Identification API",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -25,10 +47,20 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Compress large JSON bodies (the catalog endpoints) for slow mobile links
+app.add_middleware(CompressionMiddleware)
+
+# Admin-triggered or sampled request profiling (see routers/debug.py)
+app.add_middleware(ProfilingMiddleware)
+
+# Keep a client's reads on the primary right after it writes (read replicas)
+app.add_middleware(ReadYourWritesMiddleware)
+
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(snake.router, prefix="/snake", tags=["Snakes"])
 app.include_router(snake_related.router, prefix="/snake-related", tags=["Snake Relations"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 app.include_router(debug.debug_router)  # Include our debug router
 
 # Mount static files directory
@@ -38,7 +70,23 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 def read_root():
     return {"message": "Snake Identification API is running!"}
 
+@app.get("/health")
+def health():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: models loaded and warmed, database reachable and migrated"""
+    result = lifecycle.readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for this worker (admission queue depth, waits, shedding)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-form")
 def test_form():
     """Serve the test form HTML file"""
-    return FileResponse("static/test_form.html")
\ No newline at end of file
+    return FileResponse("static/test_form.html")
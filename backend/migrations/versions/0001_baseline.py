@@ -0,0 +1,70 @@
+"""Baseline schema: users, snakes, chats, snake_related
+
+Matches what Base.metadata.create_all used to create at start-up. Tables
+that already exist (databases created before migrations were introduced)
+are left alone, so existing deployments can simply run
+`alembic upgrade head`.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("userid", sa.Integer(), primary_key=True, index=True),
+            sa.Column("username", sa.String(255), nullable=False, unique=True),
+            sa.Column("password", sa.String(255), nullable=False),
+            sa.Column("token", sa.Text()),
+            sa.Column("is_admin", sa.Boolean(), default=False),
+            sa.Column("createddate", sa.TIMESTAMP(), server_default=sa.func.now()),
+        )
+
+    if "snakes" not in existing:
+        op.create_table(
+            "snakes",
+            sa.Column("snakeid", sa.Integer(), primary_key=True, index=True),
+            sa.Column("snakeenglishname", sa.String(255), nullable=False),
+            sa.Column("snakesinhalaname", sa.String(255)),
+            sa.Column("snakeenglishdescription", sa.Text()),
+            sa.Column("snakesinhaladescription", sa.Text()),
+            sa.Column("snakeimage", sa.LargeBinary()),
+            sa.Column("snakeimage_type", sa.String(50)),
+            sa.Column("class_label", sa.String(100)),
+        )
+
+    if "chats" not in existing:
+        op.create_table(
+            "chats",
+            sa.Column("chatid", sa.Integer(), primary_key=True, index=True),
+            sa.Column("chatrequest", sa.Text(), nullable=False),
+            sa.Column("chatresponse", sa.Text(), nullable=False),
+            sa.Column("userid", sa.Integer(), sa.ForeignKey("users.userid", ondelete="CASCADE"), nullable=False),
+            sa.Column("createddate", sa.TIMESTAMP(), server_default=sa.func.now()),
+        )
+
+    if "snake_related" not in existing:
+        op.create_table(
+            "snake_related",
+            sa.Column("snakeid", sa.Integer(), sa.ForeignKey("snakes.snakeid", ondelete="CASCADE"), primary_key=True),
+            sa.Column("relatedsnakeid", sa.Integer(), sa.ForeignKey("snakes.snakeid", ondelete="CASCADE"), primary_key=True),
+        )
+
+
+def downgrade():
+    op.drop_table("snake_related")
+    op.drop_table("chats")
+    op.drop_table("snakes")
+    op.drop_table("users")
@@ -0,0 +1,46 @@
+"""Indexes for hot lookups
+
+- snakes.class_label: identification maps a predicted class to its snake
+- snake_related.relatedsnakeid: reverse lookups (which snakes a related
+  species belongs to); the primary key only covers snakeid-first lookups
+- chats.userid: /chat/history
+
+MySQL may already have an index on a column (modify_schema.py created
+idx_class_label, and InnoDB indexes foreign key columns automatically), in
+which case that column is skipped.
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_hot_path_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_snakes_class_label", "snakes", "class_label"),
+    ("ix_snake_related_relatedsnakeid", "snake_related", "relatedsnakeid"),
+    ("ix_chats_userid", "chats", "userid"),
+]
+
+
+def _leading_index_columns(inspector, table):
+    return {index["column_names"][0] for index in inspector.get_indexes(table) if index["column_names"]}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, column in INDEXES:
+        if column not in _leading_index_columns(inspector, table):
+            op.create_index(name, table, [column])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in INDEXES:
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,30 @@
+"""snakes.updateddate for incremental exports
+
+Existing rows are stamped with the migration time, so the first
+incremental export after upgrading includes every snake.
+
+Revision ID: 0003_snake_updateddate
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_snake_updateddate"
+down_revision = "0002_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The model sets the value on insert/update; a server default would need
+    # a table rebuild on SQLite, which refuses non-constant column defaults
+    op.add_column("snakes", sa.Column("updateddate", sa.TIMESTAMP(), nullable=True))
+    op.execute(sa.text("UPDATE snakes SET updateddate = CURRENT_TIMESTAMP"))
+    op.create_index("ix_snakes_updateddate", "snakes", ["updateddate"])
+
+
+def downgrade():
+    op.drop_index("ix_snakes_updateddate", table_name="snakes")
+    with op.batch_alter_table("snakes") as batch:
+        batch.drop_column("updateddate")
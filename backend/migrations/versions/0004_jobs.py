@@ -0,0 +1,39 @@
+"""jobs table for the background job runner
+
+Revision ID: 0004_jobs
+Revises: 0003_snake_updateddate
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_jobs"
+down_revision = "0003_snake_updateddate"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("jobid", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("progress", sa.Float(), nullable=False),
+        sa.Column("message", sa.String(255)),
+        sa.Column("error", sa.Text()),
+        sa.Column("worker", sa.String(100)),
+        sa.Column("run_after", sa.TIMESTAMP(), nullable=False),
+        sa.Column("createddate", sa.TIMESTAMP()),
+        sa.Column("updateddate", sa.TIMESTAMP()),
+    )
+    # Workers poll for the oldest due job in a given status
+    op.create_index("ix_jobs_status_run_after", "jobs", ["status", "run_after"])
+
+
+def downgrade():
+    op.drop_index("ix_jobs_status_run_after", table_name="jobs")
+    op.drop_table("jobs")
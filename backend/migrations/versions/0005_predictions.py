@@ -0,0 +1,36 @@
+"""predictions table for the prediction log
+
+Revision ID: 0005_predictions
+Revises: 0004_jobs
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_predictions"
+down_revision = "0004_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "predictions",
+        sa.Column("predictionid", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("createddate", sa.TIMESTAMP(), nullable=False),
+        sa.Column("image_hash", sa.String(64), nullable=False),
+        sa.Column("class_index", sa.Integer(), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=False),
+        sa.Column("probabilities", sa.Text(), nullable=False),
+        sa.Column("latency_ms", sa.Float(), nullable=False),
+        sa.Column("model_version", sa.String(64)),
+        sa.Column("source", sa.String(20), nullable=False),
+    )
+    op.create_index("ix_predictions_createddate", "predictions", ["createddate"])
+    op.create_index("ix_predictions_image_hash", "predictions", ["image_hash"])
+
+
+def downgrade():
+    op.drop_index("ix_predictions_image_hash", table_name="predictions")
+    op.drop_index("ix_predictions_createddate", table_name="predictions")
+    op.drop_table("predictions")
@@ -1,11 +1,86 @@
-from sqlalchemy import create_engine
+import contextvars
+import itertools
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from core.config import DATABASE_URL
+from core import metrics
+from core.config import DATABASE_URL, DATABASE_REPLICA_URLS
+
+
+def _connect_args(url: str) -> dict:
+    # SQLite (used for local load tests) must allow connections across threads
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=_connect_args(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# ------------------------
+# Read replicas
+# ------------------------
+# Read-only endpoints use get_read_db, which hands out a session on one of
+# the DATABASE_REPLICA_URLS engines (round robin). Everything else, and every
+# script, stays on the primary. Without replicas get_read_db is get_db.
+#
+# Read-your-writes: a request that writes through the primary gets a
+# db_primary_until cookie (set by ReadYourWritesMiddleware in core/replicas.py),
+# and that client's reads go to the primary for the next REPLICA_STICKY_S
+# seconds, while the replicas catch up.
+#
+# To try it locally with two SQLite files:
+#   DATABASE_URL=sqlite:///primary.db DATABASE_REPLICA_URLS=sqlite:///replica.db
+# and copy primary.db over replica.db to "replicate".
+replica_engines = [
+    create_engine(url, pool_pre_ping=True, connect_args=_connect_args(url))
+    for url in DATABASE_REPLICA_URLS
+]
+ReplicaSessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+_next_replica = itertools.cycle(ReplicaSessions)
+
+STICKY_COOKIE = "db_primary_until"
+
+metrics.counter("db_read_sessions_total", "Read-only sessions, by where they were routed")
+
+# Set per request by ReadYourWritesMiddleware; holds {"wrote": bool}
+request_writes = contextvars.ContextVar("request_writes", default=None)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_write(session, flush_context):
+    writes = request_writes.get()
+    if writes is not None:
+        writes["wrote"] = True
+
+
+def _refuse_write(session, flush_context, instances):
+    raise RuntimeError("Read-only session: writes must go through get_db")
+
+
+for ReplicaSession in ReplicaSessions:
+    event.listen(ReplicaSession, "before_flush", _refuse_write)
+
+
+def sticky_until(request: Request) -> float:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+def use_primary_for_reads(request: Request) -> bool:
+    """True when this client wrote within the last REPLICA_STICKY_S seconds"""
+    writes = request_writes.get()
+    if writes is not None and writes["wrote"]:
+        return True
+    return sticky_until(request) > time.time()
+
+
 # Dependency for FastAPI endpoints
 def get_db():
     db = SessionLocal()
@@ -13,3 +88,19 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency for read-only endpoints
+def get_read_db(request: Request):
+    if not ReplicaSessions:
+        db = SessionLocal()
+    elif use_primary_for_reads(request):
+        metrics.inc("db_read_sessions_total", target="primary")
+        db = SessionLocal()
+    else:
+        metrics.inc("db_read_sessions_total", target="replica")
+        db = next(_next_replica)()
+    try:
+        yield db
+    finally:
+        db.close()
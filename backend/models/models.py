@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, TIMESTAMP, ForeignKey, LargeBinary
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, Float, TIMESTAMP, ForeignKey, LargeBinary, Index
 from sqlalchemy.sql import func
 import models.database
 
@@ -21,17 +21,47 @@ class Snake(models.database.Base):
     snakesinhaladescription = Column(Text)
     snakeimage = Column(LargeBinary)           # Binary image data stored directly in DB
     snakeimage_type = Column(String(50))       # Image MIME type (e.g., 'image/jpeg')
-    class_label = Column(String(100))  # for mapping model predictions (stores 0-4)
+    class_label = Column(String(100), index=True)  # for mapping model predictions (stores 0-4)
+    updateddate = Column(TIMESTAMP, default=func.now(), onupdate=func.now(), index=True)  # for incremental exports
 
 class Chat(models.database.Base):
     __tablename__ = "chats"
     chatid = Column(Integer, primary_key=True, index=True)
     chatrequest = Column(Text, nullable=False)
     chatresponse = Column(Text, nullable=False)
-    userid = Column(Integer, ForeignKey("users.userid", ondelete="CASCADE"), nullable=False)
+    userid = Column(Integer, ForeignKey("users.userid", ondelete="CASCADE"), nullable=False, index=True)
     createddate = Column(TIMESTAMP, server_default=func.now())
 
 class SnakeRelated(models.database.Base):
     __tablename__ = "snake_related"
     snakeid = Column(Integer, ForeignKey("snakes.snakeid", ondelete="CASCADE"), primary_key=True)
-    relatedsnakeid = Column(Integer, ForeignKey("snakes.snakeid", ondelete="CASCADE"), primary_key=True)
+    relatedsnakeid = Column(Integer, ForeignKey("snakes.snakeid", ondelete="CASCADE"), primary_key=True, index=True)
+
+class Job(models.database.Base):
+    __tablename__ = "jobs"
+    jobid = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)          # handler name in core/jobs.py
+    payload = Column(Text, nullable=False)             # JSON
+    status = Column(String(20), nullable=False)        # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    progress = Column(Float, nullable=False, default=0.0)  # 0..1
+    message = Column(String(255))                      # current step
+    error = Column(Text)                               # last failure
+    worker = Column(String(100))                       # host:pid:thread running it
+    run_after = Column(TIMESTAMP, nullable=False)      # not before (retry backoff)
+    createddate = Column(TIMESTAMP, default=func.now())
+    updateddate = Column(TIMESTAMP, default=func.now(), onupdate=func.now())  # heartbeat while running
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+class Prediction(models.database.Base):
+    __tablename__ = "predictions"
+    predictionid = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    createddate = Column(TIMESTAMP, nullable=False, index=True)  # when the prediction was made (UTC)
+    image_hash = Column(String(64), nullable=False, index=True)  # sha256 of the uploaded image / tensor
+    class_index = Column(Integer, nullable=False)
+    confidence = Column(Float, nullable=False)
+    probabilities = Column(Text, nullable=False)       # JSON list, one per class
+    latency_ms = Column(Float, nullable=False)         # decode + model time
+    model_version = Column(String(64))
+    source = Column(String(20), nullable=False)        # image, tensor or live
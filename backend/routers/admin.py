@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core import inference, jobs, model_reload
+from models import models
+from models.database import get_db
+from routers.auth import admin_required
+
+router = APIRouter()
+
+
+# ------------------------
+# Endpoint: model status
+# ------------------------
+@router.get("/models")
+async def model_status(current_user: models.User = Depends(admin_required)):
+    """Active model version and the outcome of the last reload in this worker"""
+    if inference.remote is not None:
+        status = await run_in_threadpool(inference.refresh_remote_status)
+        return {"mode": "remote", "version": status.get("model_version"), "servers": inference.remote.addresses}
+    return {"mode": "local", "version": inference.current_version(), "reload": model_reload.status()}
+
+
+# ------------------------
+# Endpoint: hot reload
+# ------------------------
+@router.post("/models/reload")
+async def reload_models(current_user: models.User = Depends(admin_required)):
+    """Load, validate and swap in the model files on disk without a restart.
+    Poll GET /admin/models for the outcome."""
+    try:
+        if inference.remote is not None:
+            replies = await run_in_threadpool(inference.remote.reload)
+            return JSONResponse({"mode": "remote", "servers": replies}, status_code=202)
+
+        if not inference.models_ready():
+            raise HTTPException(status_code=503, detail="Models not loaded")
+        # Touch the trigger first so the reload below records it and this
+        # worker's watcher doesn't start a second one; other workers follow.
+        await run_in_threadpool(model_reload.touch_trigger)
+        if not model_reload.request_reload("admin"):
+            raise HTTPException(status_code=409, detail="A model reload is already running")
+        return JSONResponse({"mode": "local", "reload": model_reload.status()}, status_code=202)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ------------------------
+# Endpoints: background jobs
+# ------------------------
+@router.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required)
+):
+    """Jobs, newest first. status is a comma-separated list; by default the
+    ones that need attention: queued, running and failed."""
+    statuses = [s.strip() for s in (status or "queued,running,failed").split(",") if s.strip()]
+    unknown = [s for s in statuses if s not in jobs.STATUSES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown status {', '.join(unknown)}; use {', '.join(jobs.STATUSES)}")
+    query = db.query(models.Job).filter(models.Job.status.in_(statuses))
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    rows = query.order_by(models.Job.jobid.desc()).limit(max(1, min(limit, 1000))).all()
+    counts = dict(
+        db.query(models.Job.status, func.count()).group_by(models.Job.status).all()
+    )
+    return {"counts": {s: counts.get(s, 0) for s in jobs.STATUSES}, "jobs": [jobs.to_dict(job) for job in rows]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+    job = db.get(models.Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.to_dict(job)
+
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+    """Queue a failed job again, with a fresh set of attempts"""
+    job = db.get(models.Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried; this one is {job.status}")
+    job.status = "queued"
+    job.attempts = 0
+    job.progress = 0.0
+    job.run_after = datetime.utcnow()
+    db.info["jobs_enqueued"] = True
+    db.commit()
+    return jobs.to_dict(job)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from models.database import get_db
+from models.database import get_db, get_read_db
 from models.models import Chat, User
 from routers.auth import get_current_user
 from schemas.chat import ChatCreate, ChatResponse
@@ -29,7 +29,7 @@ async def create_chat(
 @router.get("/history", response_model=list[ChatResponse])
 async def get_chat_history(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get chat history for the current user. Only authenticated users can access this endpoint.
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import FileResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import Optional
+import os
 import traceback
 import sys
 
+from core import profiling
 from models import models
 from models.database import get_db
-from routers.auth import get_current_user
+from routers.auth import get_current_user, admin_required
 
 # Global variable to store the last error
 last_error = {"error": "No errors logged yet", "traceback": ""}
@@ -55,4 +60,43 @@ async def test_admin(current_user: models.User = Depends(get_current_user)):
 async def get_last_error():
     """Get the last error that occurred in the API"""
     global last_error
-    return last_error
\ No newline at end of file
+    return last_error
+
+
+# ------------------------
+# Request profiling (admin only)
+# ------------------------
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = None
+    tf_trace: Optional[bool] = None
+
+
+@debug_router.get("/profiling")
+async def get_profiling(current_user: models.User = Depends(admin_required)):
+    """Sampling settings and the stored profiles, newest first.
+    Profile a single request by sending it with X-Profile: 1 (or tf)."""
+    return {"settings": profiling.settings, "profiles": profiling.list_profiles()}
+
+
+@debug_router.put("/profiling")
+async def set_profiling(update: ProfilingSettings, current_user: models.User = Depends(admin_required)):
+    """Change sampling for this worker; sample_rate 0 turns it off"""
+    if update.sample_rate is not None:
+        if not 0 <= update.sample_rate <= 1:
+            raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+        profiling.settings["sample_rate"] = update.sample_rate
+    if update.tf_trace is not None:
+        profiling.settings["tf_trace"] = update.tf_trace
+    return profiling.settings
+
+
+@debug_router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "txt", current_user: models.User = Depends(admin_required)):
+    """Download a stored profile: txt (report), prof (pstats) or tf (trace zip)"""
+    path = profiling.profile_file(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "txt":
+        with open(path) as f:
+            return PlainTextResponse(f.read())
+    return FileResponse(path, filename=os.path.basename(path), media_type="application/octet-stream")
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, Request, status
-from fastapi.responses import JSONResponse, Response
-from PIL import Image
-import numpy as np
-import tensorflow as tf
-import joblib
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, Request, WebSocket, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import os
 import json
 import io
 import traceback
-from typing import Optional
-from sqlalchemy.orm import Session
-import base64
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.orm import Session, load_only
 
+from core import admission, catalog_export, catalog_import, catalog_snapshot, deadlines, embeddings, fieldsets, inference, jobs, live, model_reload, name_search
+from core.config import TENSOR_MAX_BATCH
+from core.responses import FastJSONResponse
 from models import models
-from models.database import get_db
-from routers.auth import get_current_user
+from models.database import get_db, get_read_db, SessionLocal
+from routers.auth import get_current_user, admin_required
 from routers.debug import record_error
+from schemas.snake import SnakeOut
 
 router = APIRouter()
 
@@ -29,60 +31,148 @@ SNAKE_CLASSES = {
 }
 
 # ------------------------
-# Load models at startup
+# Endpoint: predict snake
 # ------------------------
-try:
-    # Feature extractor
-    mobilenet = tf.keras.models.load_model("models/mobilenet.h5")
-    print("✅ MobileNet loaded")
-except Exception as e:
-    print(f"❌ MobileNet load error: {e}")
-    mobilenet = None
+@router.post("/identify-snake")
+async def identify_snake(
+    image: UploadFile = File(...),
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
+):
+    if not inference.models_ready():
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    
+    try:
+        class_idx, confidence, version = await admission.identification.run(inference.identify, await image.read(), deadline=deadline)
+        return JSONResponse(
+            {"class_index": class_idx, "confidence": confidence, "model_version": version},
+            headers={"X-Model-Version": version or ""},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-try:
-    # PCA transformer
-    pca = joblib.load("models/pca_model.pkl")
-    print("✅ PCA loaded")
-except Exception as e:
-    print(f"❌ PCA load error: {e}")
-    pca = None
 
-try:
-    # Classifier
-    classifier = tf.keras.models.load_model("models/classifier.h5")
-    print("✅ Classifier loaded")
-except Exception as e:
-    print(f"❌ Classifier load error: {e}")
-    classifier = None
+# ------------------------
+# Endpoint: predict from pre-resized tensors
+# ------------------------
+@router.post("/identify-tensor")
+async def identify_tensor(
+    request: Request,
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
+):
+    """Identify images the client already resized: the request body is
+    224x224x3 uint8 RGB data, raw (N*150528 bytes) or a .npy array of shape
+    (224, 224, 3) or (N, 224, 224, 3). Skips image decoding entirely."""
+    if not inference.models_ready():
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    
+    max_bytes = TENSOR_MAX_BATCH * inference.TENSOR_BYTES + 4096  # room for the .npy header
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"At most {TENSOR_MAX_BATCH} images per request")
+    body = await request.body()
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"At most {TENSOR_MAX_BATCH} images per request")
+    try:
+        images = inference.decode_tensor(body)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(images) > TENSOR_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {TENSOR_MAX_BATCH} images per request")
+    
+    try:
+        results, version = await admission.identification.run(inference.identify_tensor, images, deadline=deadline)
+        return JSONResponse(
+            {
+                "results": [{"class_index": class_idx, "confidence": confidence} for class_idx, confidence in results],
+                "model_version": version,
+            },
+            headers={"X-Model-Version": version or ""},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 # ------------------------
-# Helper: preprocess image
+# Endpoint: live camera identification
 # ------------------------
-def preprocess_image(image: UploadFile):
-    img = Image.open(image.file).convert("RGB").resize((224, 224))
-    arr = np.array(img) / 255.0
-    arr = arr[np.newaxis, ...]  # add batch dim
-    features = mobilenet.predict(arr)
-    features = features.reshape(features.shape[0], -1)
-    reduced_features = pca.transform(features)
-    return reduced_features
+@router.websocket("/live")
+async def live_identify(websocket: WebSocket, max_fps: float = 0):
+    """Stream camera frames in, get identifications of the newest frame back"""
+    await websocket.accept()
+    if not inference.models_ready():
+        await websocket.send_json({"error": "Models not loaded"})
+        await websocket.close(code=1013)  # try again later
+        return
+    
+    session = live.LiveSession(max_fps)
+    receiver = asyncio.create_task(session.receive(websocket))
+    try:
+        await session.process(websocket)
+    except Exception:
+        pass  # client went away mid-send
+    finally:
+        receiver.cancel()
+
 
 # ------------------------
-# Endpoint: predict snake
+# Endpoint: visually similar catalog species
 # ------------------------
-@router.post("/identify-snake")
-async def identify_snake(image: UploadFile = File(...)):
-    if not (mobilenet and pca and classifier):
-        raise HTTPException(status_code=500, detail="Models not loaded")
+@router.post("/similar")
+async def similar_snakes(
+    image: UploadFile = File(...),
+    k: int = 5,
+    db: Session = Depends(get_read_db),
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
+):
+    """Return the k catalog species (main and related) whose images look most like the upload"""
+    if not inference.models_ready():
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    if model_reload.embeddings_stale():
+        raise HTTPException(status_code=503, detail="Similarity index is being rebuilt for the new model")
     
     try:
-        reduced_features = preprocess_image(image)
-        preds = classifier.predict(reduced_features)
-        class_idx = int(np.argmax(preds, axis=1)[0])
-        confidence = float(np.max(preds))
-        return JSONResponse({"class_index": class_idx, "confidence": confidence})
+        query = (await admission.identification.run(
+            embeddings.embed_images, [await image.read()], deadline=deadline
+        ))[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    k = max(1, min(k, 50))
+    # The index keeps rows for snakes deleted since; skip those and fetch
+    # further down the ranking until there are k or the index runs out
+    result = []
+    seen = set()
+    fetch = k
+    while True:
+        matches = embeddings.index.search(query, fetch)
+        new = [(snake_id, score) for snake_id, score in matches if snake_id not in seen]
+        seen.update(snake_id for snake_id, _ in new)
+        snakes = db.query(models.Snake).options(load_only(
+            models.Snake.snakeid,
+            models.Snake.snakeenglishname,
+            models.Snake.snakesinhalaname,
+            models.Snake.class_label
+        )).filter(models.Snake.snakeid.in_([snake_id for snake_id, _ in new])).all()
+        snakes_by_id = {snake.snakeid: snake for snake in snakes}
+        
+        for snake_id, score in new:
+            snake = snakes_by_id.get(snake_id)
+            if snake:
+                result.append({
+                    "snakeid": snake.snakeid,
+                    "snakeenglishname": snake.snakeenglishname,
+                    "snakesinhalaname": snake.snakesinhalaname,
+                    "class_label": str(snake.class_label) if snake.class_label is not None else None,
+                    "similarity": score
+                })
+        if len(result) >= k or len(matches) < fetch:
+            return result[:k]
+        fetch *= 2
 
 
 # ------------------------
@@ -96,35 +186,40 @@ async def test_endpoint():
 # ------------------------
 # Admin snake management
 # ------------------------
-@router.get("/all")
-async def get_all_snakes(db: Session = Depends(get_db)):
-    """Get all snakes from the database"""
+@router.get("/all", response_model=List[SnakeOut])
+async def get_all_snakes(
+    request: Request,
+    fields: Optional[str] = None,
+    lang: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get all snakes, served from the prebuilt catalog snapshot when there is one.
+    fields= / lang= select a subset of each entry (see core/fieldsets.py)."""
+    fieldset = fieldsets.parse(fields, lang)
+    if fieldset is not None:
+        snakes = db.query(models.Snake).options(fieldset.options()).order_by(models.Snake.snakeid).all()
+        return FastJSONResponse([fieldset.serialize(snake) for snake in snakes])
+    
+    current = catalog_snapshot.snapshot.current()
+    if current is not None:
+        return catalog_snapshot.snapshot.response(current, request.headers)
     try:
         snakes = db.query(models.Snake).all()
-        result = []
-        for snake in snakes:
-            snake_data = {
-                "snakeid": snake.snakeid,
-                "snakeenglishname": snake.snakeenglishname,
-                "snakesinhalaname": snake.snakesinhalaname,
-                "snakeenglishdescription": snake.snakeenglishdescription,
-                "snakesinhaladescription": snake.snakesinhaladescription,
-                "class_label": str(snake.class_label) if snake.class_label is not None else None
-            }
-            
-            # Only include image data when it exists
-            if snake.snakeimage:
-                image_type = snake.snakeimage_type or 'image/jpeg'  # Default to JPEG if type is missing
-                image_base64 = base64.b64encode(snake.snakeimage).decode('utf-8')
-                snake_data["image_data"] = f"data:{image_type};base64,{image_base64}"
-            
-            result.append(snake_data)
-        return result
+        return [SnakeOut.from_snake(snake) for snake in snakes]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
+@router.get("/search")
+async def search_snakes(q: str, lang: Optional[str] = None, limit: int = 10, fuzzy: bool = True):
+    """Typeahead search on English and Sinhala names: prefix matches first,
+    then typo-tolerant ones (see core/name_search.py). lang: en, si or en,si."""
+    languages = fieldsets.parse_languages(lang)
+    if len(q) > 100:
+        raise HTTPException(status_code=400, detail="Query too long")
+    return FastJSONResponse(await run_in_threadpool(name_search.search, q, languages, limit, fuzzy))
+
 @router.get("/image/{snake_id}")
-async def get_snake_image(snake_id: int, db: Session = Depends(get_db)):
+async def get_snake_image(snake_id: int, db: Session = Depends(get_read_db)):
     """Get the image of a specific snake"""
     snake = db.query(models.Snake).filter(models.Snake.snakeid == snake_id).first()
     if not snake or not snake.snakeimage:
@@ -243,12 +338,17 @@ async def add_snake(
             )
             
             db.add(relation)
+            related_snake_id = related_snake.snakeid
+            job = jobs.enqueue(db, "snake_changed", {"snakeid": related_snake_id, "image": True})
             db.commit()
+            # Until the job republishes it, /snake/all reads the database
+            await run_in_threadpool(catalog_snapshot.snapshot.invalidate)
             
             return {
                 "message": "Related species added successfully",
                 "main_snake_id": main_snake.snakeid,
-                "related_snake_id": related_snake.snakeid
+                "related_snake_id": related_snake_id,
+                "job_id": job.jobid
             }
             
         else:
@@ -297,11 +397,14 @@ async def add_snake(
             )
             
             db.add(new_snake)
+            db.flush()
+            new_snake_id = new_snake.snakeid
+            job = jobs.enqueue(db, "snake_changed", {"snakeid": new_snake_id, "image": True})
             db.commit()
-            db.refresh(new_snake)
+            await run_in_threadpool(catalog_snapshot.snapshot.invalidate)
         
         # For regular snakes (not related species), just return success
-        return {"message": "Snake added successfully", "snakeid": new_snake.snakeid}
+        return {"message": "Snake added successfully", "snakeid": new_snake_id, "job_id": job.jobid}
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {str(e)}")
         print(f"Raw snake_data: {snake_data}")
@@ -370,6 +473,7 @@ async def update_snake(
             snake.snakesinhaladescription = data["snakesinhaladescription"]
         
         # Handle image upload if provided
+        image_content = None
         if image and await image.read(1):
             # Reset file position
             await image.seek(0)
@@ -381,11 +485,66 @@ async def update_snake(
             snake.snakeimage = image_content
             snake.snakeimage_type = image.content_type or "image/jpeg"
         
+        job = jobs.enqueue(db, "snake_changed", {"snakeid": snake_id, "image": image_content is not None})
         db.commit()
-        return {"message": "Snake updated successfully"}
+        await run_in_threadpool(catalog_snapshot.snapshot.invalidate)
+        return {"message": "Snake updated successfully", "job_id": job.jobid}
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in snake_data")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/bulk-import")
+async def bulk_import(
+    archive: UploadFile = File(...),
+    manifest: UploadFile = File(None),
+    dry_run: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required)
+):
+    """Import many snakes from a zip/tar of images plus a CSV/JSONL manifest (admin only)"""
+    try:
+        # The uploads are spooled to temp files, so this streams from disk
+        return await run_in_threadpool(
+            catalog_import.import_catalog,
+            db,
+            archive.file,
+            manifest.file if manifest else None,
+            manifest.filename if manifest else "manifest.csv",
+            dry_run=dry_run
+        )
+    except catalog_import.CatalogImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        record_error(e, "/snake/bulk-import")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export")
+async def export_catalog(
+    format: str = "zip",
+    since_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    current_user: models.User = Depends(admin_required)
+):
+    """Stream all snakes, relations and images as a zip or tar.gz (admin only).
+    since_id / since limit it to snakes added or updated after that point."""
+    if format not in catalog_export.WRITERS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(catalog_export.WRITERS)}")
+
+    def stream():
+        # Own session: it has to outlive the request handler
+        db = SessionLocal()
+        try:
+            yield from catalog_export.iter_export(db, format, since_id, since)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=catalog_export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{catalog_export.filename(format)}"'}
+    )
@@ -1,17 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, load_only
+from core import admission, catalog_snapshot, deadlines, fieldsets, inference, jobs, relation_graph
+from core.responses import FastJSONResponse
 from models import models
-from models.database import get_db
+from models.database import get_db, get_read_db
 from routers.auth import get_current_user, admin_required
 import schemas.snake as schemas
 import json
-import base64
-from typing import Dict, Any, Optional
-import tensorflow as tf
-import numpy as np
-from PIL import Image
-import io
-import joblib
+from typing import Dict, Any, List, Optional
 import os
 
 router = APIRouter()
@@ -126,18 +123,22 @@ async def add_related_species(
             )
             
             db.add(new_relation)
-            db.commit()
-            db.refresh(new_snake)
-            
-            return {
+            job = jobs.enqueue(db, "snake_changed", {"snakeid": new_snake.snakeid, "image": True})
+            result = {
                 "message": "Related species added successfully", 
                 "snakeid": new_snake.snakeid,
                 "parent_snakeid": parent_snake_id,
                 "snake_details": {
                     "name": new_snake.snakeenglishname,
                     "class_label": new_snake.class_label  # Should be None
-                }
+                },
+                "job_id": job.jobid
             }
+            db.commit()
+            # Until the job republishes it, /snake/all reads the database
+            await run_in_threadpool(catalog_snapshot.snapshot.invalidate)
+            
+            return result
         except Exception as db_error:
             db.rollback()
             # Log detailed error
@@ -158,18 +159,36 @@ async def add_related_species(
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/related/{snake_id}")
+def related_query(db: Session, snake_id: int, fieldset: fieldsets.FieldSet):
+    """Related snakes of snake_id in one query, loading only the fieldset's columns"""
+    return (
+        db.query(models.Snake)
+        .options(fieldset.options())
+        .join(models.SnakeRelated, models.SnakeRelated.relatedsnakeid == models.Snake.snakeid)
+        .filter(models.SnakeRelated.snakeid == snake_id)
+        .order_by(models.SnakeRelated.relatedsnakeid)
+        .all()
+    )
+
+@router.get("/related/{snake_id}", response_model=List[schemas.SnakeOut])
 async def get_related_snakes(
     snake_id: int,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    lang: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
-    """Get all related snakes for a specific snake"""
+    """Get all related snakes for a specific snake.
+    fields= / lang= select a subset of each entry (see core/fieldsets.py)."""
+    fieldset = fieldsets.parse(fields, lang)
     try:
         # Check if the snake exists
-        main_snake = db.query(models.Snake).filter(models.Snake.snakeid == snake_id).first()
+        main_snake = db.query(models.Snake).options(load_only(models.Snake.snakeid)).filter(models.Snake.snakeid == snake_id).first()
         if not main_snake:
             raise HTTPException(status_code=404, detail=f"Snake with ID {snake_id} not found")
         
+        if fieldset is not None:
+            return FastJSONResponse([fieldset.serialize(snake) for snake in related_query(db, snake_id, fieldset)])
+        
         # Get all related snake IDs
         relations = db.query(models.SnakeRelated).filter(models.SnakeRelated.snakeid == snake_id).all()
         related_snake_ids = [relation.relatedsnakeid for relation in relations]
@@ -179,23 +198,7 @@ async def get_related_snakes(
         for related_id in related_snake_ids:
             snake = db.query(models.Snake).filter(models.Snake.snakeid == related_id).first()
             if snake:
-                snake_data = {
-                    "snakeid": snake.snakeid,
-                    "snakeenglishname": snake.snakeenglishname,
-                    "snakesinhalaname": snake.snakesinhalaname,
-                    "snakeenglishdescription": snake.snakeenglishdescription,
-                    "snakesinhaladescription": snake.snakesinhaladescription,
-                    "class_label": str(snake.class_label) if snake.class_label is not None else None
-                }
-                
-                # Add image data if it exists
-                if snake.snakeimage:
-                    import base64
-                    image_type = snake.snakeimage_type or 'image/jpeg'
-                    image_base64 = base64.b64encode(snake.snakeimage).decode('utf-8')
-                    snake_data["image_data"] = f"data:{image_type};base64,{image_base64}"
-                
-                related_snakes.append(snake_data)
+                related_snakes.append(schemas.SnakeOut.from_snake(snake))
         
         return related_snakes
     except HTTPException:
@@ -203,83 +206,51 @@ async def get_related_snakes(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Load models for classification
-try:
-    # Feature extractor
-    mobilenet = tf.keras.models.load_model("models/mobilenet.h5")
-except Exception as e:
-    print(f"❌ MobileNet load error: {e}")
-    mobilenet = None
-
-try:
-    # PCA transformer
-    pca = joblib.load("models/pca_model.pkl")
-except Exception as e:
-    print(f"❌ PCA load error: {e}")
-    pca = None
-
-try:
-    # Classifier
-    classifier = tf.keras.models.load_model("models/classifier.h5")
-except Exception as e:
-    print(f"❌ Classifier load error: {e}")
-    classifier = None
-
-# Helper function to preprocess the image
-def preprocess_image(image_content):
-    img = Image.open(io.BytesIO(image_content)).convert("RGB").resize((224, 224))
-    arr = np.array(img) / 255.0
-    arr = arr[np.newaxis, ...]  # add batch dim
-    features = mobilenet.predict(arr)
-    features = features.reshape(features.shape[0], -1)
-    reduced_features = pca.transform(features)
-    return reduced_features
-
-@router.post("/identify-with-related")
+@router.post("/identify-with-related", response_model=schemas.IdentifyWithRelatedResponse)
 async def identify_with_related(
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    lang: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
 ):
     """
     Identify a snake from an uploaded image and return details with related species.
     This endpoint can be used without authentication.
+    fields= / lang= select a subset of each entry (see core/fieldsets.py).
     """
+    fieldset = fieldsets.parse(fields, lang)
     # Check if models are loaded
-    if not (mobilenet and pca and classifier):
-        raise HTTPException(status_code=500, detail="Classification models not loaded")
+    if not inference.models_ready():
+        raise HTTPException(status_code=503, detail="Classification models not loaded")
     
     try:
         # Read the image content
         image_content = await image.read()
         
         # Process the image and make prediction
-        reduced_features = preprocess_image(image_content)
-        preds = classifier.predict(reduced_features)
-        class_idx = int(np.argmax(preds, axis=1)[0])
-        confidence = float(np.max(preds))
+        class_idx, confidence, version = await admission.identification.run(inference.identify, image_content, deadline=deadline)
+        # Skip the catalog lookups if nobody is waiting for the answer any more
+        deadline.check("related")
         
         # Get snake details based on class_label
-        snake = db.query(models.Snake).filter(models.Snake.class_label == str(class_idx)).first()
+        query = db.query(models.Snake)
+        if fieldset is not None:
+            query = query.options(fieldset.options())
+        snake = query.filter(models.Snake.class_label == str(class_idx)).first()
         
         if not snake:
             raise HTTPException(status_code=404, detail=f"No snake found with class label {class_idx}")
         
-        # Prepare snake data
-        snake_data = {
-            "snakeid": snake.snakeid,
-            "snakeenglishname": snake.snakeenglishname,
-            "snakesinhalaname": snake.snakesinhalaname,
-            "snakeenglishdescription": snake.snakeenglishdescription,
-            "snakesinhaladescription": snake.snakesinhaladescription,
-            "class_label": str(snake.class_label),
-            "confidence": confidence
-        }
+        if fieldset is not None:
+            return FastJSONResponse({
+                "snake": fieldset.serialize(snake, confidence=confidence),
+                "related_snakes": [fieldset.serialize(related) for related in related_query(db, snake.snakeid, fieldset)],
+                "model_version": version,
+            })
         
-        # Add image data
-        if snake.snakeimage:
-            image_type = snake.snakeimage_type or 'image/jpeg'
-            image_base64 = base64.b64encode(snake.snakeimage).decode('utf-8')
-            snake_data["image_data"] = f"data:{image_type};base64,{image_base64}"
+        # Prepare snake data
+        snake_data = schemas.IdentifiedSnakeOut.from_snake(snake, confidence=confidence)
         
         # Get related snakes
         relations = db.query(models.SnakeRelated).filter(models.SnakeRelated.snakeid == snake.snakeid).all()
@@ -289,29 +260,13 @@ async def identify_with_related(
         for related_id in related_snake_ids:
             related_snake = db.query(models.Snake).filter(models.Snake.snakeid == related_id).first()
             if related_snake:
-                related_snake_data = {
-                    "snakeid": related_snake.snakeid,
-                    "snakeenglishname": related_snake.snakeenglishname,
-                    "snakesinhalaname": related_snake.snakesinhalaname,
-                    "snakeenglishdescription": related_snake.snakeenglishdescription,
-                    "snakesinhaladescription": related_snake.snakesinhaladescription,
-                    "class_label": str(related_snake.class_label) if related_snake.class_label is not None else None
-                }
-                
-                # Add image data if it exists
-                if related_snake.snakeimage:
-                    related_image_type = related_snake.snakeimage_type or 'image/jpeg'
-                    related_image_base64 = base64.b64encode(related_snake.snakeimage).decode('utf-8')
-                    related_snake_data["image_data"] = f"data:{related_image_type};base64,{related_image_base64}"
-                
-                related_snakes.append(related_snake_data)
+                related_snakes.append(schemas.SnakeOut.from_snake(related_snake))
         
         # Return both snake data and related snakes
-        return {
-            "snake": snake_data,
-            "related_snakes": related_snakes
-        }
+        return schemas.IdentifyWithRelatedResponse(snake=snake_data, related_snakes=related_snakes, model_version=version)
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -352,9 +307,8 @@ async def remove_snake_relation(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/all-relations")
+@router.get("/all-relations", response_model=List[schemas.SnakeRelationResponse])
 async def get_all_relations(
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Get all snake relations (admin only)"""
@@ -363,30 +317,27 @@ async def get_all_relations(
         raise HTTPException(status_code=403, detail="Only admins can view all relations")
     
     try:
-        # Get all relations
-        relations = db.query(models.SnakeRelated).all()
-        
-        result = []
-        for relation in relations:
-            # Get snake details for more readable output
-            main_snake = db.query(models.Snake).filter(models.Snake.snakeid == relation.snakeid).first()
-            related_snake = db.query(models.Snake).filter(models.Snake.snakeid == relation.relatedsnakeid).first()
-            
-            if main_snake and related_snake:
-                result.append({
-                    "snakeid": relation.snakeid,
-                    "main_snake_name": main_snake.snakeenglishname,
-                    "relatedsnakeid": relation.relatedsnakeid,
-                    "related_snake_name": related_snake.snakeenglishname
-                })
-        
-        return result
+        # Names come from the relation graph index, not one query per row
+        def relations():
+            with relation_graph.graph.reading() as graph:
+                return [
+                    schemas.SnakeRelationResponse(
+                        snakeid=snakeid,
+                        main_snake_name=graph.nodes[snakeid]["snakeenglishname"],
+                        relatedsnakeid=relatedsnakeid,
+                        related_snake_name=graph.nodes[relatedsnakeid]["snakeenglishname"]
+                    )
+                    for snakeid, relatedsnakeid in graph.edges()
+                    if snakeid in graph.nodes and relatedsnakeid in graph.nodes
+                ]
+
+        return await run_in_threadpool(relations)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch-add-relations")
 async def batch_add_snake_relations(
-    relation_data_list: list,
+    relation_data_list: List[Dict[str, Any]],
     current_user: models.User = Depends(admin_required),
     db: Session = Depends(get_db)
 ):
@@ -443,3 +394,71 @@ async def batch_add_snake_relations(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+
+# ------------------------
+# Endpoints: relation graph (answered from core/relation_graph.py, no queries)
+# ------------------------
+def _graph_node(graph, snake_id: int):
+    if snake_id not in graph.nodes:
+        raise HTTPException(status_code=404, detail=f"Snake with ID {snake_id} not found")
+    return graph.node(snake_id)
+
+@router.get("/graph/{snake_id}/parents")
+async def get_parent_snakes(snake_id: int):
+    """The snakes this one is listed as a related species of"""
+    def parents():
+        with relation_graph.graph.reading() as graph:
+            return {
+                "snake": _graph_node(graph, snake_id),
+                "parents": [graph.node(parent) for parent in graph.parents(snake_id)],
+            }
+    return await run_in_threadpool(parents)
+
+@router.get("/graph/{snake_id}/neighborhood")
+async def get_neighborhood(snake_id: int, hops: int = 2, direction: str = "out"):
+    """Every snake within hops relations of this one, nearest first.
+    direction: out (related species), in (parents) or both."""
+    if not 1 <= hops <= relation_graph.MAX_HOPS:
+        raise HTTPException(status_code=400, detail=f"hops must be between 1 and {relation_graph.MAX_HOPS}")
+    if direction not in relation_graph.DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"direction must be one of: {', '.join(relation_graph.DIRECTIONS)}")
+
+    def neighborhood():
+        with relation_graph.graph.reading() as graph:
+            snake = _graph_node(graph, snake_id)
+            distances = graph.neighborhood(snake_id, hops, direction)
+            del distances[snake_id]
+            return {
+                "snake": snake,
+                "hops": hops,
+                "direction": direction,
+                "snakes": [
+                    graph.node(other, hops=distance)
+                    for other, distance in sorted(distances.items(), key=lambda item: (item[1], item[0]))
+                ],
+            }
+    return await run_in_threadpool(neighborhood)
+
+@router.get("/graph/{snake_id}/component")
+async def get_component(snake_id: int):
+    """Every snake connected to this one by relations in either direction"""
+    def component():
+        with relation_graph.graph.reading() as graph:
+            return {
+                "snake": _graph_node(graph, snake_id),
+                "snakes": [graph.node(member) for member in graph.component(snake_id)],
+            }
+    return await run_in_threadpool(component)
+
+@router.get("/graph/components")
+async def get_components(min_size: int = 2):
+    """Connected components of the relation graph, largest first.
+    Snakes with no relations are left out unless min_size=1."""
+    def components():
+        with relation_graph.graph.reading() as graph:
+            found = graph.components(max(1, min_size))
+            return {
+                "count": len(found),
+                "components": [[graph.node(member) for member in members] for members in found],
+            }
+    return await run_in_threadpool(components)
@@ -1,3 +1,4 @@
+import base64
 from pydantic import BaseModel, validator
 from typing import Optional, List, Dict, Any
 
@@ -64,6 +65,46 @@ class SnakeRelationResponse(BaseModel):
     main_snake_name: str
     relatedsnakeid: int
     related_snake_name: str
+
+def image_data_url(snake) -> Optional[str]:
+    """data: URL with the snake's base64 image, None when it has no image"""
+    if not snake.snakeimage:
+        return None
+    image_type = snake.snakeimage_type or 'image/jpeg'  # Default to JPEG if type is missing
+    image_base64 = base64.b64encode(snake.snakeimage).decode('utf-8')
+    return f"data:{image_type};base64,{image_base64}"
+
+class SnakeOut(BaseModel):
+    """Catalog entry as returned by the listing and identification endpoints"""
+    snakeid: int
+    snakeenglishname: str
+    snakesinhalaname: Optional[str] = None
+    snakeenglishdescription: Optional[str] = None
+    snakesinhaladescription: Optional[str] = None
+    class_label: Optional[str] = None
+    # data: URL with the base64 image, None when the snake has no image
+    image_data: Optional[str] = None
+
+    @classmethod
+    def from_snake(cls, snake, **extra):
+        return cls(
+            snakeid=snake.snakeid,
+            snakeenglishname=snake.snakeenglishname,
+            snakesinhalaname=snake.snakesinhalaname,
+            snakeenglishdescription=snake.snakeenglishdescription,
+            snakesinhaladescription=snake.snakesinhaladescription,
+            class_label=str(snake.class_label) if snake.class_label is not None else None,
+            image_data=image_data_url(snake),
+            **extra
+        )
+
+class IdentifiedSnakeOut(SnakeOut):
+    confidence: float
+
+class IdentifyWithRelatedResponse(BaseModel):
+    snake: IdentifiedSnakeOut
+    related_snakes: List[SnakeOut]
+    model_version: Optional[str] = None
     
 class BatchRelationCreate(BaseModel):
     relation_data_list: List[SnakeRelationCreate]